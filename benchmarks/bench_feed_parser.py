@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+Benchmark: reading a large feed document into incidents.
+
+Compares feedparser plus the per-entry mapping and sort the bot used to
+do with feed_parser.read_feed, reading every entry and stopping at the
+first run of known entries, on a synthetic feed. Reports wall time and
+peak traced memory per read.
+
+    python benchmarks/bench_feed_parser.py [--entries 5000] [--new 3] [--number 5]
+"""
+import argparse
+import os
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import feedparser
+
+from benchmarks.fixtures import make_feed
+from feed_parser import read_feed
+
+
+def legacy_read(content):
+    """feedparser.parse, sort and mapping as done before read_feed."""
+    feed = feedparser.parse(content)
+    entries = sorted(feed.entries, key=lambda x: x.get('published', ''), reverse=True)
+    return [
+        {
+            'guid': entry.get('guid', entry.get('id', '')),
+            'title': entry.get('title', 'No title'),
+            'description': entry.get('summary', entry.get('description', '')),
+            'link': entry.get('link', ''),
+            'last_updated': entry.get('published', entry.get('updated', str(datetime.now())))
+        }
+        for entry in entries
+    ]
+
+
+def measure(name, func, number):
+    started = time.perf_counter()
+    for _ in range(number):
+        result = func()
+    seconds = (time.perf_counter() - started) / number
+
+    tracemalloc.start()
+    func()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    print(f"  {name:<24} {seconds * 1000:9.1f} ms  {peak / 2**20:8.1f} MiB peak")
+    return result, seconds, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--entries', type=int, default=5000)
+    parser.add_argument('--new', type=int, default=3, help='entries not seen by the previous poll')
+    parser.add_argument('--number', type=int, default=5)
+    args = parser.parse_args()
+
+    content = make_feed(args.entries)
+    print(f"{args.entries} entries, {len(content) / 2**20:.1f} MiB document, {args.new} new")
+
+    # What the previous poll saw: the feed without its newest entries
+    known = {
+        incident['guid']: incident['entry_hash']
+        for incident in read_feed(content).incidents[args.new:]
+    }
+
+    legacy, legacy_seconds, legacy_peak = measure('feedparser', lambda: legacy_read(content), args.number)
+    full, full_seconds, full_peak = measure('read_feed', lambda: read_feed(content), args.number)
+    stopped, stop_seconds, stop_peak = measure('read_feed (stop at 5)', lambda: read_feed(
+        content,
+        is_known=lambda guid, entry_hash: known.get(guid) == entry_hash,
+        stop_after=5
+    ), args.number)
+
+    # The legacy sort compared RFC 822 date strings, so only the entries
+    # themselves are expected to match, not their order
+    assert {incident['guid'] for incident in full.incidents} == {incident['guid'] for incident in legacy}
+    assert len(stopped.incidents) == args.new and not stopped.complete
+
+    print(f"  read_feed: {legacy_seconds / full_seconds:.1f}x faster, {legacy_peak / full_peak:.1f}x less memory")
+    print(f"  stop at known: {legacy_seconds / stop_seconds:.0f}x faster, {legacy_peak / stop_peak:.0f}x less memory")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+Microbenchmark: incident description cleaning.
+
+Compares the regex/str.replace chain that StatusBot._clean_html used to
+run with html_clean.clean_description, uncached and cached, on
+Statuspage-style payloads. Descriptions from a local incident database
+are added when one is found.
+
+    python benchmarks/bench_html_clean.py [--db lovable_status.db] [--number 20000]
+"""
+import argparse
+import os
+import re
+import sqlite3
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from html_clean import clean_description
+
+COMPONENTS = (
+    '<br /><br /><b>Affected components</b>\n          <ul>\n'
+    '          <li>Editor (Partial outage)</li>\n'
+    '          <li>Website (Full outage)</li>\n'
+    '          <li>API (Degraded performance)</li>\n'
+    '          </ul>'
+)
+
+PAYLOADS = {
+    'short': '<b>Status: Investigating</b><br /><br />Some Lovable projects are unresponsive.' + COMPONENTS,
+    'entities': (
+        '<b>Status: Identified</b><br /><br />We&#39;ve identified the issue &amp; are '
+        'deploying a fix for &quot;chat&quot; requests &lt;&gt; the editor.&nbsp;&nbsp;'
+        'Thanks for your patience.' + COMPONENTS
+    ),
+    'long': (
+        '<b>Status: Monitoring</b><br /><br />'
+        + 'We are currently experiencing service disruptions due to an outage in the '
+          'AWS us-east-1 region. Some users may be unable to access certain services.\n\n'
+          ' • Using a VPN to connect\n • Switching your DNS settings\n\n' * 12
+        + COMPONENTS
+    ),
+}
+
+
+def legacy_clean_html(html_text):
+    """The implementation clean_description replaced, kept for comparison."""
+    if not html_text:
+        return ""
+    components = [match.strip() for match in re.findall(r'<li>([^<]+)\s*\([^)]+\)</li>', html_text)]
+    text = re.sub(r'<b>Affected components</b>.*?</ul>', '', html_text, flags=re.DOTALL)
+    text = re.sub(r'<[^>]+>', '', text)
+    text = text.replace('&nbsp;', ' ')
+    text = text.replace('&amp;', '&')
+    text = text.replace('&lt;', '<')
+    text = text.replace('&gt;', '>')
+    text = text.replace('&quot;', '"')
+    text = text.replace('&#39;', "'")
+    text = re.sub(r'\s+', ' ', text)
+    text = re.sub(r'\n\s*\n', '\n', text)
+    status_pattern = r'^Status:\s*(Resolved|Identified|Monitoring|Investigating)\s*'
+    text = re.sub(status_pattern, '', text, flags=re.IGNORECASE)
+    return text.strip(), components
+
+
+def load_db_payloads(db_path):
+    with sqlite3.connect(db_path) as conn:
+        rows = conn.execute("SELECT description FROM incidents WHERE description != ''").fetchall()
+    return [row[0] for row in rows]
+
+
+def bench(name, func, payloads, number):
+    seconds = timeit.timeit(lambda: [func(payload) for payload in payloads], number=number)
+    per_call = seconds / (number * len(payloads)) * 1e6
+    print(f"  {name:<22} {per_call:8.2f} us/call")
+    return per_call
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--db', default='lovable_status.db')
+    parser.add_argument('--number', type=int, default=20000)
+    args = parser.parse_args()
+
+    suites = {name: [payload] for name, payload in PAYLOADS.items()}
+    if os.path.exists(args.db):
+        suites['database'] = load_db_payloads(args.db)
+
+    uncached = clean_description.__wrapped__
+    for name, payloads in suites.items():
+        for payload in payloads:
+            text, components = uncached(payload)
+            assert (text, list(components)) == legacy_clean_html(payload), payload
+
+        number = max(1, args.number // len(payloads))
+        print(f"{name} ({len(payloads)} payloads, {number} rounds)")
+        legacy = bench('legacy', legacy_clean_html, payloads, number)
+        single = bench('clean_description', uncached, payloads, number)
+        cached = bench('clean_description+cache', clean_description, payloads, number)
+        print(f"  speedup {legacy / single:.1f}x uncached, {legacy / cached:.1f}x cached")
+
+
+if __name__ == '__main__':
+    main()
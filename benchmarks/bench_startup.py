@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+Benchmark: start-up cost of the one-shot runners.
+
+Measures the import time of ``monitor_simple`` and ``main`` with
+``python -X importtime`` and lists the slowest modules, then times whole
+runs of ``monitor_simple.py`` and ``main.py --once`` against a local
+mock feed and Bot API once the feed is stored, i.e. the common case of a
+scheduled run that gets a 304 and exits. It also lists which heavy
+modules such a run loaded: feedparser and python-telegram-bot should not
+be among them, and monitor_simple should not need requests or httpx.
+
+    python benchmarks/bench_startup.py [--number 10] [--top 10]
+"""
+import argparse
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from http.server import ThreadingHTTPServer
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+sys.path.insert(0, ROOT)
+
+from benchmarks.fixtures import make_feed
+from benchmarks.mock_server import MockTelegram, StaticFeed, make_handler
+
+# Modules a run that finds the feed unchanged has no use for
+HEAVY_MODULES = ('feedparser', 'telegram', 'requests', 'httpx')
+
+RUNNERS = {
+    'monitor_simple': [os.path.join(ROOT, 'monitor_simple.py')],
+    'main --once': [os.path.join(ROOT, 'main.py'), '--once'],
+}
+
+
+def parse_importtime(stderr: str):
+    """(module, self us, cumulative us) for every line of -X importtime output."""
+    modules = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        modules.append((name.strip(), int(self_us), int(cumulative_us)))
+    return modules
+
+
+def import_time(module: str, workdir: str, env: dict, number: int):
+    """Median cumulative import time of ``module`` in ms and the modules it loaded in that run."""
+    runs = []
+    for _ in range(number):
+        result = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+            cwd=workdir, env=env, capture_output=True, text=True, check=True
+        )
+        modules = parse_importtime(result.stderr)
+        # Everything up to the module's own line was imported on its behalf,
+        # apart from what site loaded at interpreter start
+        site = max(index for index, (name, _, _) in enumerate(modules) if name == 'site')
+        modules = modules[site + 1:]
+        runs.append((modules[-1][2], modules))
+    runs.sort(key=lambda run: run[0])
+    total, modules = runs[len(runs) // 2]
+    return total / 1000, modules
+
+
+def run(command, workdir: str, env: dict, importtime: bool = False):
+    args = [sys.executable] + (['-X', 'importtime'] if importtime else []) + command
+    started = time.perf_counter()
+    result = subprocess.run(args, cwd=workdir, env=env, capture_output=True, text=True)
+    elapsed = time.perf_counter() - started
+    if result.returncode != 0:
+        raise RuntimeError(f"{' '.join(command)} failed:\n{result.stdout}\n{result.stderr}")
+    return elapsed, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--number', type=int, default=10)
+    parser.add_argument('--top', type=int, default=10, help='slowest modules to list per entry point')
+    parser.add_argument('--entries', type=int, default=50)
+    args = parser.parse_args()
+
+    server = ThreadingHTTPServer(
+        ('127.0.0.1', 0), make_handler(MockTelegram(chat_rate=0, global_rate=0), StaticFeed(make_feed(args.entries)))
+    )
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f'http://127.0.0.1:{server.server_address[1]}'
+    workdir = tempfile.mkdtemp(prefix='lovable-startup-')
+    env = dict(
+        os.environ,
+        TELEGRAM_BOT_TOKEN='123456:BENCH',
+        TELEGRAM_CHANNEL_ID='@bench',
+        TELEGRAM_API_URL=base_url + '/bot',
+        RSS_FEED_URL=base_url + '/feed.rss',
+        # monitor_simple always uses lovable_status.db; the bot keeps its own
+        DATABASE_PATH=os.path.join(workdir, 'bot.db'),
+        LOG_LEVEL='WARNING',
+        PYTHONPATH=ROOT,
+        PYTHONDONTWRITEBYTECODE='1'
+    )
+
+    try:
+        print(f"Import time (median of {args.number}):")
+        for module in ('monitor_simple', 'main'):
+            total, modules = import_time(module, workdir, env, args.number)
+            print(f"  {module}: {total:.1f} ms")
+            for name, self_us, cumulative_us in sorted(modules, key=lambda m: m[1], reverse=True)[:args.top]:
+                print(f"    {name:<40} {self_us / 1000:6.1f} ms self {cumulative_us / 1000:7.1f} ms cumulative")
+
+        print(f"\nUnchanged feed, whole run (median of {args.number}):")
+        for label, command in RUNNERS.items():
+            # The first run stores the feed and its validators
+            run(command, workdir, env)
+            seconds = statistics.median(run(command, workdir, env)[0] for _ in range(args.number))
+            _, result = run(command, workdir, env, importtime=True)
+            loaded = {name for name, _, _ in parse_importtime(result.stderr)}
+            heavy = [name for name in HEAVY_MODULES if name in loaded]
+            print(f"  {label}: {seconds * 1000:.0f} ms, heavy modules loaded: {', '.join(heavy) or 'none'}")
+    finally:
+        server.shutdown()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+Benchmark: classifying an incident's status from long update histories.
+
+Compares the substring scans the bot used to do (lowercase the description
+and title, then look for each status word in turn) with
+status_parser.classify_status, uncached and cached, on Statuspage-style
+descriptions of a growing number of updates. The newest update of each
+history is Investigating and an older one Resolved, which the substring
+scans misread as resolved.
+
+    python benchmarks/bench_status.py [--updates 1,10,100,1000] [--number 2000]
+"""
+import argparse
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from status_parser import classify_status
+
+TITLE = 'Elevated error rates in the editor'
+
+BLOCK = (
+    "<p><small>Jul <var data-var='date'>{day}</var>, <var data-var='time'>{hour:02d}:00</var> UTC</small><br>"
+    "<strong>{status}</strong> - We&#39;re looking into failing requests in the editor. "
+    "Some users may see errors when opening projects &amp; publishing changes.</p>"
+)
+
+# Newest first: the incident was resolved, then came back
+CYCLE = ('Investigating', 'Update', 'Resolved', 'Monitoring', 'Identified')
+
+
+def make_history(updates: int) -> str:
+    return ''.join(
+        BLOCK.format(day=28 - index // 24, hour=23 - index % 24, status=CYCLE[index % len(CYCLE)])
+        for index in range(updates)
+    )
+
+
+def legacy_status(text: str) -> str:
+    """The substring scans classify_status replaced."""
+    text_lower = text.lower()
+    if 'resolved' in text_lower:
+        return 'Resolved'
+    elif 'identified' in text_lower:
+        return 'Identified'
+    elif 'monitoring' in text_lower:
+        return 'Monitoring'
+    elif 'investigating' in text_lower:
+        return 'Investigating'
+    return 'Unknown'
+
+
+def measure(func, number: int) -> float:
+    return min(timeit.repeat(func, number=number, repeat=5)) / number
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--updates', default='1,10,100,1000', help='comma-separated history lengths')
+    parser.add_argument('--number', type=int, default=2000)
+    args = parser.parse_args()
+
+    uncached = classify_status.__wrapped__
+    print(f"{'updates':>8} {'bytes':>8} {'legacy':>10} {'classify':>10} {'cached':>10} {'speedup':>8}  status (legacy)")
+    for updates in (int(n) for n in args.updates.split(',')):
+        description = make_history(updates)
+        text = description + ' ' + TITLE
+        result = uncached(description, TITLE)
+        assert result.update_count == updates
+        if updates > 2:
+            assert result.status == 'Investigating'
+
+        legacy_seconds = measure(lambda: legacy_status(text), args.number)
+        classify_seconds = measure(lambda: uncached(description, TITLE), args.number)
+        classify_status(description, TITLE)
+        cached_seconds = measure(lambda: classify_status(description, TITLE), args.number)
+        print(
+            f"{updates:>8} {len(description):>8} {legacy_seconds * 1e6:8.1f}us {classify_seconds * 1e6:8.1f}us "
+            f"{cached_seconds * 1e6:8.2f}us {legacy_seconds / classify_seconds:7.1f}x  "
+            f"{result.status} ({legacy_status(text)})"
+        )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,65 @@
+"""
+Synthetic Statuspage-style feeds for the benchmarks.
+
+``make_feed(n)`` returns an RSS 2.0 document with ``n`` incidents, newest
+first, shaped like the entries status.lovable.dev publishes.
+"""
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime
+
+STATUSES = ('Investigating', 'Identified', 'Monitoring', 'Resolved')
+
+ITEM = '''    <item>
+      <title>{title}</title>
+      <description><![CDATA[<b>Status: {status}</b><br /><br />{body}<br /><br /><b>Affected components</b>
+          <ul>
+          <li>Editor (Partial outage)</li>
+          <li>API (Degraded performance)</li>
+          </ul>]]></description>
+      <pubDate>{published}</pubDate>
+      <link>https://status.example.com/incidents/{ident}</link>
+      <guid>https://status.example.com/incidents/{ident}</guid>
+    </item>
+'''
+
+BODY = (
+    "We&#39;re investigating reports of failing requests in the editor. "
+    "Some users may see errors when opening projects &amp; publishing changes. "
+)
+
+
+def make_item(index: int, status: str, published: datetime) -> str:
+    return ITEM.format(
+        title=f"Incident {index}: elevated error rates",
+        status=status,
+        body=BODY * 3,
+        published=format_datetime(published, usegmt=True),
+        ident=f"inc{index:07d}"
+    )
+
+
+def make_items(n: int, start: int = 0, active: int = 1):
+    """Incident items ``start`` .. ``start + n``, newest first.
+
+    The newest ``active`` incidents are unresolved, the rest resolved.
+    """
+    now = datetime(2025, 7, 18, 13, 27, 33, tzinfo=timezone.utc)
+    return [
+        make_item(index, STATUSES[index % 3] if index < active else 'Resolved', now - timedelta(hours=index))
+        for index in range(start, start + n)
+    ]
+
+
+def feed_document(items) -> bytes:
+    return (
+        '<?xml version="1.0" encoding="UTF-8"?>\n'
+        '<rss version="2.0">\n  <channel>\n'
+        '    <title>Example Status - Incident History</title>\n'
+        '    <link>https://status.example.com</link>\n'
+        + ''.join(items)
+        + '  </channel>\n</rss>\n'
+    ).encode('utf-8')
+
+
+def make_feed(n: int, active: int = 1) -> bytes:
+    return feed_document(make_items(n, active=active))
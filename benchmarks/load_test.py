@@ -0,0 +1,192 @@
+#!/usr/bin/env python3
+"""
+End-to-end load test against benchmarks/mock_server.py.
+
+Starts the mock server, points the bot (``--target bot``) or repeated
+monitor_simple.py runs (``--target simple``) at it until every scripted
+incident is resolved, and reports Telegram messages per second, the
+latency from a status appearing in the feed to its message being
+accepted, and how many messages were dropped: outbox rows given up on or
+still pending at the end (for monitor_simple, posts that failed in its
+last run).
+
+    python benchmarks/load_test.py --incidents 30 --spacing 0.5 --step 3 --channels 3 --flood-rate 0.05
+"""
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, ROOT)
+
+from benchmarks.mock_server import add_arguments
+
+
+def start_server(args):
+    command = [sys.executable, os.path.join(ROOT, 'benchmarks', 'mock_server.py')]
+    for name in ('port', 'latency', 'jitter', 'error_rate', 'flood_rate', 'retry_after',
+                 'chat_rate', 'global_rate', 'incidents', 'spacing', 'step', 'history'):
+        command += ['--' + name.replace('_', '-'), str(getattr(args, name))]
+    server = subprocess.Popen(command, stdout=subprocess.PIPE, text=True)
+    server.stdout.readline()
+    return server
+
+
+def fetch_stats(port):
+    with urllib.request.urlopen(f'http://127.0.0.1:{port}/stats') as response:
+        return json.load(response)
+
+
+def bot_environment(args, workdir):
+    base = f'http://127.0.0.1:{args.port}'
+    channels = [f'@load{number}' for number in range(args.channels)]
+    feeds_file = os.path.join(workdir, 'feeds.json')
+    with open(feeds_file, 'w') as f:
+        json.dump([{
+            'name': 'default',
+            'url': base + '/feed.rss',
+            'interval_minutes': args.poll / 60,
+            'channels': channels
+        }], f)
+    return channels, dict(
+        os.environ,
+        TELEGRAM_BOT_TOKEN='123456:LOADTEST',
+        TELEGRAM_CHANNEL_ID=channels[0],
+        TELEGRAM_API_URL=base + '/bot',
+        RSS_FEED_URL=base + '/feed.rss',
+        FEEDS_FILE=feeds_file,
+        DATABASE_PATH=os.path.join(workdir, 'load.db'),
+        INITIAL_LOAD_DAYS='0',
+        LOG_LEVEL='WARNING',
+        TELEGRAM_GLOBAL_RATE=str(args.bot_global_rate),
+        TELEGRAM_CHAT_RATE_PER_MINUTE=str(args.bot_chat_rate),
+        TELEGRAM_MAX_CONCURRENCY=str(args.concurrency)
+    )
+
+
+async def run_bot(args, deadline):
+    """Poll with StatusBot in this process; returns the deliveries that were
+    given up on or are still pending at the deadline."""
+    import main
+    bot = main.StatusBot()
+    bot.outbox.start()
+    try:
+        while time.time() < deadline:
+            started = time.monotonic()
+            await bot.fetch_and_process_feed()
+            await asyncio.sleep(max(0.0, args.poll - (time.monotonic() - started)))
+        # Failed sends are retried from the outbox; only rows left in it
+        # never reached Telegram
+        return bot.db.conn.execute('SELECT COUNT(*) FROM outbox').fetchone()[0]
+    finally:
+        await bot.close()
+
+
+def run_simple(args, env, workdir, deadline):
+    """Run monitor_simple.py once per poll; returns the posts that failed in
+    the last run."""
+    failed = 0
+    script = os.path.join(ROOT, 'monitor_simple.py')
+    while time.time() < deadline:
+        started = time.monotonic()
+        output = subprocess.run(
+            [sys.executable, script], cwd=workdir, env=env, capture_output=True, text=True
+        ).stdout
+        # Posts that fail are retried by the next run
+        for line in output.splitlines():
+            if line.startswith('- Failed to post:'):
+                failed = int(line.rsplit(':', 1)[1])
+        time.sleep(max(0.0, args.poll - (time.monotonic() - started)))
+    return failed
+
+
+def percentile(values, fraction):
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(len(values) - 1, int(fraction * len(values)))]
+
+
+def report(args, stats, channels, failed):
+    visible = {(index, status): at for index, status, at in stats['transitions']}
+    latencies = [
+        at - visible[(index, status)]
+        for chat, index, status, at in stats['deliveries']
+        if (index, status) in visible
+    ]
+    if args.target == 'simple':
+        # The simple monitor only ever posts an incident's first status
+        expected = {(chat, index, status) for chat in channels for index, status in visible
+                    if status == 'Investigating'}
+    else:
+        expected = {(chat, index, status) for chat in channels for index, status in visible}
+    delivered = {(chat, index, status) for chat, index, status, _ in stats['deliveries']}
+
+    accepted = stats['sent'] + stats['edited']
+    elapsed = (stats['last_success'] or 0) - (stats['first_success'] or 0)
+    result = {
+        'target': args.target,
+        'channels': len(channels),
+        'requests': stats['requests'],
+        'accepted': accepted,
+        'messages_per_second': round(accepted / elapsed, 2) if elapsed > 0 else None,
+        'flood_429': stats['flood'],
+        'errors_500': stats['errors'],
+        'dropped': failed,
+        'missed_transitions': len(expected - delivered),
+        'latency_p50': percentile(latencies, 0.5),
+        'latency_p90': percentile(latencies, 0.9),
+        'latency_p99': percentile(latencies, 0.99),
+        'latency_max': max(latencies) if latencies else None
+    }
+    if args.json:
+        print(json.dumps(result, indent=2))
+    else:
+        for key, value in result.items():
+            if isinstance(value, float):
+                value = f'{value:.3f}'
+            print(f'  {key:<20} {value}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    add_arguments(parser)
+    parser.add_argument('--target', choices=('bot', 'simple'), default='bot')
+    parser.add_argument('--channels', type=int, default=1, help='channels every incident is posted to')
+    parser.add_argument('--poll', type=float, default=1.0, help='seconds between polls')
+    parser.add_argument('--drain', type=float, default=10.0, help='seconds to keep polling after the last change')
+    parser.add_argument('--bot-global-rate', type=float, default=30)
+    parser.add_argument('--bot-chat-rate', type=float, default=20)
+    parser.add_argument('--concurrency', type=int, default=4)
+    parser.add_argument('--json', action='store_true')
+    args = parser.parse_args()
+    if args.target == 'simple':
+        args.channels = 1
+
+    workdir = tempfile.mkdtemp(prefix='lovable-load-')
+    channels, env = bot_environment(args, workdir)
+    server = start_server(args)
+    try:
+        deadline = fetch_stats(args.port)['lifecycle_ends_at'] + args.drain
+        if args.target == 'bot':
+            # Config is read from the environment at import time; logs go to
+            # the working directory
+            os.environ.update(env)
+            os.chdir(workdir)
+            failed = asyncio.run(run_bot(args, deadline))
+        else:
+            failed = run_simple(args, env, workdir, deadline)
+        report(args, fetch_stats(args.port), channels, failed)
+    finally:
+        server.terminate()
+        server.wait()
+
+
+if __name__ == '__main__':
+    main()
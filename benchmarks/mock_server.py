@@ -0,0 +1,335 @@
+#!/usr/bin/env python3
+"""
+Local stand-in for the Telegram Bot API and a Statuspage feed.
+
+Serves, on one port:
+
+    GET  /feed.rss                RSS feed of a scripted incident lifecycle
+    POST /bot<token>/sendMessage  \\
+    POST /bot<token>/editMessageText  Bot API methods the bots use
+    GET  /bot<token>/getMe        /
+    GET  /stats                   counters and delivery times as JSON
+
+Incident ``i`` opens ``i * spacing`` seconds after startup as
+Investigating and moves to Identified, Monitoring and Resolved every
+``step`` seconds. Bot API responses can be slowed down, fail with a 500,
+or be refused with a 429 ``retry_after``, both at random and when a
+chat or the whole bot exceeds Telegram's rate limits.
+
+    python benchmarks/mock_server.py --port 8081 --latency 50 --flood-rate 0.05
+
+Point a bot at it with ``TELEGRAM_API_URL=http://127.0.0.1:8081/bot`` and
+``RSS_FEED_URL=http://127.0.0.1:8081/feed.rss``.
+"""
+import argparse
+import hashlib
+import json
+import os
+import random
+import re
+import sys
+import threading
+import time
+from collections import deque
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from benchmarks.fixtures import feed_document, make_item
+
+LIFECYCLE = ('Investigating', 'Identified', 'Monitoring', 'Resolved')
+
+_INCIDENT = re.compile(r'INCIDENT: Incident (\d+):')
+_STATUS = re.compile(r'\*Status:\* (\w+)')
+
+
+class Lifecycle:
+    """Scripted incidents, plus ``history`` resolved ones below them."""
+
+    def __init__(self, incidents: int, spacing: float, step: float, history: int = 0):
+        self.incidents = incidents
+        self.spacing = spacing
+        self.step = step
+        self.history = history
+        self.started = time.time()
+
+    def opened_at(self, index: int) -> float:
+        return self.started + index * self.spacing
+
+    def ends_at(self) -> float:
+        return self.opened_at(self.incidents - 1) + (len(LIFECYCLE) - 1) * self.step
+
+    def transitions(self, now: float):
+        """(index, status, visible_at) of every state reached by ``now``."""
+        for index in range(self.incidents):
+            for stage, status in enumerate(LIFECYCLE):
+                visible_at = self.opened_at(index) + stage * self.step
+                if visible_at > now:
+                    break
+                yield index, status, visible_at
+
+    def document(self, now: float) -> bytes:
+        latest = {}
+        for index, status, visible_at in self.transitions(now):
+            latest[index] = (status, visible_at)
+        items = [
+            make_item(index, status, datetime.fromtimestamp(visible_at, timezone.utc))
+            for index, (status, visible_at) in sorted(latest.items(), reverse=True)
+        ]
+        # Old incidents get indexes after the scripted ones
+        oldest = datetime.fromtimestamp(self.started, timezone.utc)
+        items += [
+            make_item(self.incidents + offset, 'Resolved', oldest - timedelta(hours=offset + 1))
+            for offset in range(self.history)
+        ]
+        return feed_document(items)
+
+
+class StaticFeed:
+    """A fixed feed document in place of a lifecycle."""
+
+    def __init__(self, content: bytes):
+        self.content = content
+
+    def ends_at(self) -> float:
+        return time.time()
+
+    def transitions(self, now: float):
+        return iter(())
+
+    def document(self, now: float) -> bytes:
+        return self.content
+
+
+class SlidingWindow:
+    """Counts events in the last ``period`` seconds."""
+
+    def __init__(self, limit: float, period: float):
+        self.limit = limit
+        self.period = period
+        self.events = deque()
+
+    def retry_after(self, now: float) -> int:
+        """0 if another event fits, else the seconds until one does."""
+        while self.events and self.events[0] <= now - self.period:
+            self.events.popleft()
+        if self.limit and len(self.events) >= self.limit:
+            return max(1, int(self.events[0] + self.period - now + 0.999))
+        self.events.append(now)
+        return 0
+
+
+class MockTelegram:
+    def __init__(self, latency: float = 0.0, jitter: float = 0.0, error_rate: float = 0.0,
+                 flood_rate: float = 0.0, retry_after: int = 1, chat_rate: float = 20,
+                 global_rate: float = 30):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.flood_rate = flood_rate
+        self.retry_after = retry_after
+        self.chat_rate = chat_rate
+        self.global_rate = global_rate
+        self.lock = threading.Lock()
+        self.global_window = SlidingWindow(global_rate, 1.0)
+        self.chat_windows = {}
+        self.messages = {}
+        self.next_message_id = 1
+        self.counters = {
+            'requests': 0, 'sent': 0, 'edited': 0, 'flood': 0, 'errors': 0,
+            'not_modified': 0, 'not_found': 0
+        }
+        self.deliveries = {}
+        self.first_success = None
+        self.last_success = None
+
+    def handle(self, method: str, params: dict):
+        """Return (HTTP status, Bot API response body)."""
+        if self.latency or self.jitter:
+            time.sleep(max(0.0, self.latency + random.uniform(-self.jitter, self.jitter)))
+
+        if method == 'getMe':
+            return 200, {'ok': True, 'result': {
+                'id': 1, 'is_bot': True, 'first_name': 'Mock', 'username': 'mock_bot'
+            }}
+        if method not in ('sendMessage', 'editMessageText'):
+            return 404, {'ok': False, 'error_code': 404, 'description': 'Not Found'}
+
+        chat_id = str(params.get('chat_id', ''))
+        text = params.get('text', '')
+        now = time.time()
+        with self.lock:
+            self.counters['requests'] += 1
+            if random.random() < self.error_rate:
+                self.counters['errors'] += 1
+                return 500, {'ok': False, 'error_code': 500, 'description': 'Internal Server Error'}
+
+            retry_after = self.retry_after if random.random() < self.flood_rate else 0
+            if not retry_after:
+                window = self.chat_windows.setdefault(chat_id, SlidingWindow(self.chat_rate, 60.0))
+                retry_after = self.global_window.retry_after(now) or window.retry_after(now)
+            if retry_after:
+                self.counters['flood'] += 1
+                return 429, {
+                    'ok': False, 'error_code': 429,
+                    'description': f'Too Many Requests: retry after {retry_after}',
+                    'parameters': {'retry_after': retry_after}
+                }
+
+            if method == 'sendMessage':
+                message_id = self.next_message_id
+                self.next_message_id += 1
+                self.counters['sent'] += 1
+            else:
+                message_id = int(params.get('message_id', 0))
+                key = (chat_id, message_id)
+                if key not in self.messages:
+                    self.counters['not_found'] += 1
+                    return 400, {'ok': False, 'error_code': 400,
+                                 'description': 'Bad Request: message to edit not found'}
+                if self.messages[key] == text:
+                    self.counters['not_modified'] += 1
+                    return 400, {'ok': False, 'error_code': 400,
+                                 'description': 'Bad Request: message is not modified'}
+                self.counters['edited'] += 1
+            self.messages[(chat_id, message_id)] = text
+            self._record_delivery(chat_id, text, now)
+
+        return 200, {'ok': True, 'result': {
+            'message_id': message_id,
+            'date': int(now),
+            'chat': {'id': -100, 'type': 'channel', 'title': chat_id},
+            'text': text
+        }}
+
+    def _record_delivery(self, chat_id: str, text: str, now: float):
+        self.first_success = self.first_success or now
+        self.last_success = now
+        incident = _INCIDENT.search(text)
+        status = _STATUS.search(text)
+        if incident and status:
+            self.deliveries.setdefault((chat_id, int(incident.group(1)), status.group(1)), now)
+
+    def stats(self) -> dict:
+        with self.lock:
+            return dict(
+                self.counters,
+                first_success=self.first_success,
+                last_success=self.last_success,
+                deliveries=[[chat, index, status, at] for (chat, index, status), at in self.deliveries.items()]
+            )
+
+
+def make_handler(telegram: MockTelegram, lifecycle: Lifecycle):
+    # ETag of the last document served, so an unchanged large feed is not
+    # hashed again on every request
+    last = {'body': None, 'etag': None}
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+        # Headers and body go out in separate writes; without this every
+        # keep-alive response waits for the client's delayed ACK
+        disable_nagle_algorithm = True
+
+        def log_message(self, format, *args):
+            pass
+
+        def do_GET(self):
+            if self.path.startswith('/feed'):
+                self._feed()
+            elif self.path == '/stats':
+                stats = telegram.stats()
+                stats['lifecycle_ends_at'] = lifecycle.ends_at()
+                stats['transitions'] = [list(t) for t in lifecycle.transitions(time.time())]
+                self._json(200, stats)
+            else:
+                self._bot_api({})
+
+        def do_POST(self):
+            length = int(self.headers.get('Content-Length', 0))
+            body = self.rfile.read(length).decode('utf-8')
+            if 'json' in self.headers.get('Content-Type', ''):
+                params = json.loads(body or '{}')
+            else:
+                params = dict(parse_qsl(body))
+            self._bot_api(params)
+
+        def _bot_api(self, params):
+            match = re.match(r'^/bot[^/]+/(\w+)', self.path)
+            if not match:
+                self._json(404, {'ok': False, 'error_code': 404, 'description': 'Not Found'})
+                return
+            status, payload = telegram.handle(match.group(1), params)
+            self._json(status, payload)
+
+        def _feed(self):
+            body = lifecycle.document(time.time())
+            if body is not last['body'] and body != last['body']:
+                last.update(body=body, etag='"' + hashlib.md5(body).hexdigest() + '"')
+            etag = last['etag']
+            if self.headers.get('If-None-Match') == etag:
+                self.send_response(304)
+                self.send_header('ETag', etag)
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+                return
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/rss+xml; charset=utf-8')
+            self.send_header('ETag', etag)
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def _json(self, status, payload):
+            body = json.dumps(payload).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+    return Handler
+
+
+def add_arguments(parser: argparse.ArgumentParser):
+    parser.add_argument('--port', type=int, default=8081)
+    parser.add_argument('--latency', type=float, default=0, help='Bot API response delay in ms')
+    parser.add_argument('--jitter', type=float, default=0, help='+/- random delay in ms')
+    parser.add_argument('--error-rate', type=float, default=0, help='fraction of requests failing with 500')
+    parser.add_argument('--flood-rate', type=float, default=0, help='fraction of requests refused with 429')
+    parser.add_argument('--retry-after', type=int, default=1, help='retry_after of random 429s')
+    parser.add_argument('--chat-rate', type=float, default=20, help='messages per minute per chat (0 = unlimited)')
+    parser.add_argument('--global-rate', type=float, default=30, help='requests per second (0 = unlimited)')
+    parser.add_argument('--incidents', type=int, default=10)
+    parser.add_argument('--spacing', type=float, default=5, help='seconds between incidents opening')
+    parser.add_argument('--step', type=float, default=10, help='seconds between status changes')
+    parser.add_argument('--history', type=int, default=20, help='resolved incidents below the scripted ones')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    add_arguments(parser)
+    args = parser.parse_args()
+
+    telegram = MockTelegram(
+        latency=args.latency / 1000,
+        jitter=args.jitter / 1000,
+        error_rate=args.error_rate,
+        flood_rate=args.flood_rate,
+        retry_after=args.retry_after,
+        chat_rate=args.chat_rate,
+        global_rate=args.global_rate
+    )
+    lifecycle = Lifecycle(args.incidents, args.spacing, args.step, args.history)
+    server = ThreadingHTTPServer(('127.0.0.1', args.port), make_handler(telegram, lifecycle))
+    print(f"Mock Bot API and feed on http://127.0.0.1:{args.port}", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,216 @@
+#!/usr/bin/env python3
+"""
+Benchmark suite for the feed -> Telegram message hot path.
+
+Times status extraction, description cleaning, component extraction,
+message formatting, single-incident database reads and writes, and full
+``fetch_and_process_feed`` cycles against local fixture feeds served with
+a mock Bot API (benchmarks/mock_server.py). Results are written as JSON;
+``--compare`` prints the ratio to an earlier result file.
+
+    python benchmarks/run.py --output results.json [--sizes 10,1000,50000] [--compare old.json]
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import timeit
+from datetime import datetime, timezone
+from http.server import ThreadingHTTPServer
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, ROOT)
+
+from benchmarks.fixtures import make_feed
+from benchmarks.mock_server import MockTelegram, StaticFeed, make_handler
+
+WORKDIR = tempfile.mkdtemp(prefix='lovable-bench-')
+FEED = StaticFeed(b'')
+SERVER = ThreadingHTTPServer(('127.0.0.1', 0), make_handler(MockTelegram(chat_rate=0, global_rate=0), FEED))
+BASE_URL = f'http://127.0.0.1:{SERVER.server_address[1]}'
+
+# Config is read from the environment when main is imported
+os.environ.update(
+    TELEGRAM_BOT_TOKEN='123456:BENCH',
+    TELEGRAM_CHANNEL_ID='@bench',
+    TELEGRAM_API_URL=BASE_URL + '/bot',
+    RSS_FEED_URL=BASE_URL + '/feed.rss',
+    DATABASE_PATH=os.path.join(WORKDIR, 'bench.db'),
+    INITIAL_LOAD_DAYS='0',
+    LOG_LEVEL='WARNING',
+    TELEGRAM_GLOBAL_RATE='100000',
+    TELEGRAM_CHAT_RATE_PER_MINUTE='100000'
+)
+# Relative paths on the command line are taken from where the suite was started
+CALLER_CWD = os.getcwd()
+os.chdir(WORKDIR)
+
+from main import StatusBot
+from feed_parser import read_feed
+from html_clean import clean_description
+from storage import DatabaseManager
+
+
+class Results:
+    def __init__(self):
+        self.results = []
+
+    def time(self, name, func, number=None, repeat=5, **params):
+        """Record the per-call time of ``func`` over ``repeat`` rounds."""
+        timer = timeit.Timer(func)
+        if number is None:
+            number, _ = timer.autorange()
+        rounds = [seconds / number for seconds in timer.repeat(repeat=repeat, number=number)]
+        result = {
+            'name': name,
+            'params': params,
+            'number': number,
+            'repeat': repeat,
+            'mean': statistics.mean(rounds),
+            'median': statistics.median(rounds),
+            'min': min(rounds),
+            'stdev': statistics.stdev(rounds) if len(rounds) > 1 else 0.0
+        }
+        self.results.append(result)
+        label = name + ''.join(f' {key}={value}' for key, value in params.items())
+        print(f"  {label:<48} {result['median'] * 1e6:12.1f} us  ({number}x{repeat})", flush=True)
+        return result
+
+
+def sample_incidents(bot: StatusBot, n: int = 100):
+    incidents = read_feed(make_feed(n, active=n // 2)).incidents
+    for incident in incidents:
+        incident['status'] = bot._extract_status_from_text(incident['description'])
+    return incidents
+
+
+def bench_formatting(results: Results, bot: StatusBot):
+    incidents = sample_incidents(bot)
+    texts = [incident['description'] + ' ' + incident['title'] for incident in incidents]
+    descriptions = [incident['description'] for incident in incidents]
+    per_item = len(incidents)
+
+    def each(func, items):
+        return lambda: [func(item) for item in items]
+
+    results.time('_extract_status_from_text', each(bot._extract_status_from_text, texts), items=per_item)
+    results.time('_clean_html', each(bot._clean_html, descriptions), items=per_item)
+    results.time('_clean_html uncached', each(clean_description.__wrapped__, descriptions), items=per_item)
+    results.time('_extract_components', each(bot._extract_components, descriptions), items=per_item)
+    results.time('_format_telegram_message', each(bot._format_telegram_message, incidents), items=per_item)
+    results.time('_render_message uncached', each(bot._render_message, incidents), items=per_item)
+
+
+def bench_database(results: Results, size: int):
+    db = DatabaseManager(os.path.join(WORKDIR, f'incidents-{size}.db'))
+    try:
+        incidents = read_feed(make_feed(size)).incidents
+        for incident in incidents:
+            incident.update(status='Resolved', messages={'@bench': 1}, telegram_message_id=1)
+        db.save_incidents(incidents)
+        target = incidents[len(incidents) // 2]
+        results.time('get_incident', lambda: db.get_incident(target['guid']), rows=size)
+        results.time('save_incident', lambda: db.save_incident(target), rows=size)
+    finally:
+        db.close()
+
+
+def bench_cycle(results: Results, bot: StatusBot, loop, size: int):
+    FEED.content = make_feed(size)
+    monitor = bot.monitors[0]
+    number = 1 if size > 10000 else None
+    repeat = 3 if size > 10000 else 5
+
+    def full_cycle():
+        # Forget the validators and known entries so the document is
+        # downloaded, read and diffed in full every round
+        with bot.db.transaction() as conn:
+            conn.execute('DELETE FROM feed_validators')
+        monitor.validators = None
+        monitor.seen = None
+        loop.run_until_complete(bot.run_once())
+
+    def not_modified_cycle():
+        loop.run_until_complete(bot.run_once())
+
+    results.time('fetch_and_process_feed', full_cycle, number=number, repeat=repeat, entries=size)
+    results.time('fetch_and_process_feed 304', not_modified_cycle, number=number, repeat=repeat, entries=size)
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True, text=True
+        ).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def compare(results, path):
+    with open(path) as f:
+        previous = json.load(f)
+    baseline = {
+        (result['name'], json.dumps(result['params'], sort_keys=True)): result['median']
+        for result in previous['results']
+    }
+    print(f"\nCompared with {path} ({previous['meta'].get('commit')}):")
+    for result in results:
+        key = (result['name'], json.dumps(result['params'], sort_keys=True))
+        if key in baseline:
+            ratio = result['median'] / baseline[key]
+            label = result['name'] + ''.join(f' {k}={v}' for k, v in result['params'].items())
+            print(f"  {label:<48} {ratio:6.2f}x{'  slower' if ratio > 1.1 else ''}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--output', default='benchmark-results.json')
+    parser.add_argument('--sizes', default='10,1000,50000', help='fixture feed sizes')
+    parser.add_argument('--compare', help='earlier result file')
+    args = parser.parse_args()
+    output = os.path.join(CALLER_CWD, args.output)
+    sizes = [int(size) for size in args.sizes.split(',')]
+
+    threading.Thread(target=SERVER.serve_forever, daemon=True).start()
+    results = Results()
+    bot = StatusBot()
+    # The send queue and HTTP clients stay bound to one event loop
+    loop = asyncio.new_event_loop()
+    try:
+        print('formatting')
+        bench_formatting(results, bot)
+        for size in sizes:
+            print(f'database, {size} rows')
+            bench_database(results, size)
+        for size in sizes:
+            print(f'cycle, {size} entries')
+            bench_cycle(results, bot, loop, size)
+    finally:
+        loop.run_until_complete(bot.close())
+        loop.close()
+        SERVER.shutdown()
+
+    report = {
+        'meta': {
+            'commit': git_commit(),
+            'created_at': datetime.now(timezone.utc).isoformat(),
+            'python': platform.python_version(),
+            'platform': platform.platform()
+        },
+        'results': results.results
+    }
+    with open(output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"\nWrote {output}")
+    if args.compare:
+        compare(results.results, os.path.join(CALLER_CWD, args.compare))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,43 @@
+"""
+Small in-process caches for the formatting and delivery hot path.
+"""
+import hashlib
+from collections import OrderedDict
+from typing import Any, Optional
+
+
+def content_hash(*parts) -> str:
+    """Stable digest of the given values, used as a content address."""
+    digest = hashlib.blake2b(digest_size=16)
+    for part in parts:
+        digest.update(str(part).encode('utf-8'))
+        # Separator so ('ab', 'c') and ('a', 'bc') hash differently
+        digest.update(b'\x1f')
+    return digest.hexdigest()
+
+
+class LRUCache:
+    def __init__(self, maxsize: int = 1024):
+        self.maxsize = maxsize
+        self._data: OrderedDict = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key) -> Optional[Any]:
+        try:
+            value = self._data[key]
+        except KeyError:
+            self.misses += 1
+            return None
+        self._data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def put(self, key, value):
+        self._data[key] = value
+        self._data.move_to_end(key)
+        if len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def __len__(self):
+        return len(self._data)
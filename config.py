@@ -6,16 +6,46 @@ load_dotenv()
 class Config:
     TELEGRAM_BOT_TOKEN = os.getenv('TELEGRAM_BOT_TOKEN')
     TELEGRAM_CHANNEL_ID = os.getenv('TELEGRAM_CHANNEL_ID')
+    TELEGRAM_API_URL = os.getenv('TELEGRAM_API_URL', 'https://api.telegram.org/bot')
     RSS_FEED_URL = os.getenv('RSS_FEED_URL', 'https://status.lovable.dev/feed.rss')
+    FEEDS_FILE = os.getenv('FEEDS_FILE', '')
     CHECK_INTERVAL_MINUTES = int(os.getenv('CHECK_INTERVAL_MINUTES', '5'))
+    POLL_MODE = os.getenv('POLL_MODE', 'fixed')  # fixed or adaptive
+    POLL_ACTIVE_SECONDS = float(os.getenv('POLL_ACTIVE_SECONDS', '60'))
+    POLL_MAX_MINUTES = float(os.getenv('POLL_MAX_MINUTES', '30'))
+    POLL_BACKOFF = float(os.getenv('POLL_BACKOFF', '2'))
+    POLL_JITTER = float(os.getenv('POLL_JITTER', '0.1'))
     DATABASE_PATH = os.getenv('DATABASE_PATH', 'lovable_status.db')
     LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO')
     ONLY_ACTIVE_INCIDENTS = os.getenv('ONLY_ACTIVE_INCIDENTS', 'true').lower() == 'true'
     INITIAL_LOAD_DAYS = int(os.getenv('INITIAL_LOAD_DAYS', '7'))
+    FEED_KNOWN_RUN = int(os.getenv('FEED_KNOWN_RUN', '5'))  # 0 reads every entry
+    FEED_TIMEOUT = float(os.getenv('FEED_TIMEOUT', '30'))
+    FEED_CONNECT_TIMEOUT = float(os.getenv('FEED_CONNECT_TIMEOUT', '10'))
+    TELEGRAM_GLOBAL_RATE = float(os.getenv('TELEGRAM_GLOBAL_RATE', '30'))
+    TELEGRAM_CHAT_RATE_PER_MINUTE = float(os.getenv('TELEGRAM_CHAT_RATE_PER_MINUTE', '20'))
+    TELEGRAM_MAX_RETRIES = int(os.getenv('TELEGRAM_MAX_RETRIES', '5'))
+    TELEGRAM_MAX_CONCURRENCY = int(os.getenv('TELEGRAM_MAX_CONCURRENCY', '4'))
+    EDIT_DEBOUNCE_SECONDS = float(os.getenv('EDIT_DEBOUNCE_SECONDS', '0'))  # 0 sends every edit right away
+    OUTBOX_BATCH_SIZE = int(os.getenv('OUTBOX_BATCH_SIZE', '100'))
+    OUTBOX_RETRY_SECONDS = float(os.getenv('OUTBOX_RETRY_SECONDS', '5'))
+    OUTBOX_MAX_RETRY_MINUTES = float(os.getenv('OUTBOX_MAX_RETRY_MINUTES', '10'))
+    OUTBOX_MAX_ATTEMPTS = int(os.getenv('OUTBOX_MAX_ATTEMPTS', '10'))
+    HOT_STATE_MAX_AGE_HOURS = float(os.getenv('HOT_STATE_MAX_AGE_HOURS', '24'))
+    RENDER_CACHE_SIZE = int(os.getenv('RENDER_CACHE_SIZE', '1024'))
+    WEBHOOK_HOST = os.getenv('WEBHOOK_HOST', '0.0.0.0')
+    WEBHOOK_PORT = int(os.getenv('WEBHOOK_PORT', '0'))  # 0 disables push ingestion
+    WEBHOOK_SECRET = os.getenv('WEBHOOK_SECRET', '')
+    WEBHOOK_RECONCILE_MINUTES = float(os.getenv('WEBHOOK_RECONCILE_MINUTES', '30'))
+    METRICS_HOST = os.getenv('METRICS_HOST', '127.0.0.1')
+    METRICS_PORT = int(os.getenv('METRICS_PORT', '0'))  # 0 disables the /metrics endpoint
     
     @classmethod
     def validate(cls):
-        required_fields = ['TELEGRAM_BOT_TOKEN', 'TELEGRAM_CHANNEL_ID']
+        required_fields = ['TELEGRAM_BOT_TOKEN']
+        # With a feeds file every feed can name its own channels
+        if not cls.FEEDS_FILE:
+            required_fields.append('TELEGRAM_CHANNEL_ID')
         missing = []
         
         for field in required_fields:
@@ -25,6 +55,10 @@ class Config:
         if missing:
             raise ValueError(f"Missing required configuration: {', '.join(missing)}")
         
+        # Anyone who can reach the endpoint could otherwise post to the channels
+        if cls.WEBHOOK_PORT and not cls.WEBHOOK_SECRET:
+            raise ValueError("WEBHOOK_SECRET is required when WEBHOOK_PORT is set")
+        
         return True
 
 config = Config()
\ No newline at end of file
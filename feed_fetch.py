@@ -0,0 +1,155 @@
+"""
+Conditional fetching for the status RSS feed.
+
+The validators of the last processed response (ETag, Last-Modified and a
+hash of the body) are kept in the SQLite database (see
+``DatabaseManager.save_feed_validators``) so that both the long-running
+bot and the GitHub Actions runner can skip parsing when the feed has not
+changed.
+
+``fetch_feed`` is the blocking variant used by the one-shot runner;
+``fetch_feed_async`` does the same on a shared ``httpx.AsyncClient`` for
+the bot, so downloads never block the event loop. The client negotiates
+HTTP/2 when the ``h2`` package is installed and brotli when ``brotli`` is.
+
+httpx is imported on first use, and without a session ``fetch_feed``
+only needs the standard library, which keeps the start-up of the one-shot
+runner short.
+"""
+import gzip
+import hashlib
+import importlib.util
+import zlib
+from typing import Optional, Dict, Mapping, Tuple
+
+HTTP2_AVAILABLE = importlib.util.find_spec('h2') is not None
+
+NOT_MODIFIED = 'not_modified'
+UNCHANGED = 'unchanged'
+CHANGED = 'changed'
+
+
+class FeedFetchResult:
+    def __init__(self, status: str, content: Optional[bytes] = None,
+                 etag: Optional[str] = None, last_modified: Optional[str] = None,
+                 content_hash: Optional[str] = None):
+        self.status = status
+        self.content = content
+        self.etag = etag
+        self.last_modified = last_modified
+        self.content_hash = content_hash
+
+    @property
+    def changed(self) -> bool:
+        return self.status == CHANGED
+
+    @property
+    def validators(self) -> Dict:
+        return {
+            'etag': self.etag,
+            'last_modified': self.last_modified,
+            'content_hash': self.content_hash
+        }
+
+
+def _conditional_headers(previous: Dict) -> Dict:
+    headers = {}
+    if previous.get('etag'):
+        headers['If-None-Match'] = previous['etag']
+    if previous.get('last_modified'):
+        headers['If-Modified-Since'] = previous['last_modified']
+    return headers
+
+
+def _fetch_result(status_code: int, content: bytes, headers: Mapping,
+                  previous: Dict) -> FeedFetchResult:
+    if status_code == 304:
+        return FeedFetchResult(
+            NOT_MODIFIED,
+            etag=previous.get('etag'),
+            last_modified=previous.get('last_modified'),
+            content_hash=previous.get('content_hash')
+        )
+
+    content_hash = hashlib.sha256(content).hexdigest()
+    status = UNCHANGED if content_hash == previous.get('content_hash') else CHANGED
+
+    return FeedFetchResult(
+        status,
+        content=content,
+        etag=headers.get('ETag'),
+        last_modified=headers.get('Last-Modified'),
+        content_hash=content_hash
+    )
+
+
+def _urlopen(url: str, headers: Dict, timeout: float) -> Tuple[int, bytes, Mapping]:
+    """GET with urllib, decoding gzip/deflate like requests does."""
+    import urllib.error
+    import urllib.request
+
+    request = urllib.request.Request(url, headers=headers)
+    request.add_header('Accept-Encoding', 'gzip, deflate')
+    try:
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            status, content, response_headers = response.status, response.read(), response.headers
+    except urllib.error.HTTPError as e:
+        if e.code != 304:
+            raise
+        return 304, b'', e.headers
+
+    encoding = (response_headers.get('Content-Encoding') or '').lower()
+    if encoding == 'gzip':
+        content = gzip.decompress(content)
+    elif encoding == 'deflate':
+        content = zlib.decompress(content)
+    return status, content, response_headers
+
+
+def fetch_feed(url: str, previous: Optional[Dict] = None,
+               session: Optional['requests.Session'] = None,
+               timeout: float = 30) -> FeedFetchResult:
+    """Download the feed unless the stored validators say it is unchanged.
+
+    Sends If-None-Match / If-Modified-Since from the previous response and
+    falls back to comparing a SHA-256 of the body for servers that send
+    neither header. ``previous`` are the validators stored for this URL;
+    the caller saves the returned ones once the content was processed.
+    Without a ``session`` the request is made with urllib.
+    """
+    previous = previous or {}
+    if session is None:
+        status_code, content, headers = _urlopen(url, _conditional_headers(previous), timeout)
+        return _fetch_result(status_code, content, headers, previous)
+
+    response = session.get(url, headers=_conditional_headers(previous), timeout=timeout)
+    if response.status_code != 304:
+        response.raise_for_status()
+    return _fetch_result(response.status_code, response.content, response.headers, previous)
+
+
+def create_async_client(timeout: float = 30, connect_timeout: float = 10,
+                        max_connections: int = 10) -> 'httpx.AsyncClient':
+    """Keep-alive client shared by every feed the bot polls."""
+    import httpx
+
+    return httpx.AsyncClient(
+        http2=HTTP2_AVAILABLE,
+        timeout=httpx.Timeout(timeout, connect=connect_timeout),
+        limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections),
+        follow_redirects=True
+    )
+
+
+async def fetch_feed_async(url: str, previous: Optional[Dict] = None,
+                           client: Optional['httpx.AsyncClient'] = None) -> FeedFetchResult:
+    """Non-blocking ``fetch_feed`` on a shared ``httpx.AsyncClient``."""
+    previous = previous or {}
+    if client is None:
+        async with create_async_client() as own_client:
+            return await fetch_feed_async(url, previous, own_client)
+
+    response = await client.get(url, headers=_conditional_headers(previous))
+    if response.status_code != 304:
+        response.raise_for_status()
+    return _fetch_result(response.status_code, response.content, response.headers, previous)
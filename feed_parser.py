@@ -0,0 +1,267 @@
+"""
+Incremental reading of RSS 2.0 and Atom status feeds.
+
+Statuspage feeds list the newest entries first. ``read_feed`` parses the
+document with ``iterparse`` and maps entries to incident dicts one at a
+time, so once it reaches a run of entries that are already known it only
+has to check the dates of the rest, without building the tree or hashing
+them. Documents the streaming reader cannot handle fall back to
+feedparser.
+
+Every entry is normalized into an ``Incident`` whose ``published`` is an
+aware UTC datetime, parsed once here (or taken from feedparser's
+``published_parsed``) and used downstream for sorting, filtering and
+rendering. The feed's date strings repeat from poll to poll, so parsing
+them is cached.
+"""
+import re
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from functools import lru_cache
+from io import BytesIO
+from typing import Callable, Dict, Iterator, List, Optional, TypedDict
+from xml.etree.ElementTree import iterparse, ParseError
+
+from caching import content_hash
+from storage import DEFAULT_FEED
+
+ATOM = '{http://www.w3.org/2005/Atom}'
+
+# Child elements mapped to feedparser's entry keys
+_RSS_FIELDS = {
+    'guid': 'guid',
+    'title': 'title',
+    'description': 'description',
+    'link': 'link',
+    'pubDate': 'published',
+}
+_ATOM_FIELDS = {
+    ATOM + 'id': 'id',
+    ATOM + 'title': 'title',
+    ATOM + 'summary': 'summary',
+    ATOM + 'content': 'description',
+    ATOM + 'published': 'published',
+    ATOM + 'updated': 'updated',
+}
+
+_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+# Entry starts and date elements, to check the dates of the entries past a
+# known run without parsing them
+_ENTRY_START = re.compile(rb'<(?:item|entry)[\s>]')
+_DATE = re.compile(rb'<(pubDate|published|updated)>\s*([^<]*?)\s*</\1>')
+
+
+class Incident(TypedDict, total=False):
+    """An incident as read from a feed entry or a webhook push.
+
+    ``last_updated`` is the entry's latest date as written, ``updated`` when
+    it is later than ``published`` (and part of its hash); ``published``
+    is the creation date parsed. ``status`` is set once
+    the entry was classified.
+    """
+    feed: str
+    guid: str
+    title: str
+    description: str
+    link: str
+    last_updated: str
+    published: datetime
+    entry_hash: str
+    status: str
+
+
+class FeedSnapshot:
+    """Incidents read from one feed document, newest first.
+
+    ``complete`` is False when known entries past a run of them were skipped.
+    """
+    def __init__(self, incidents: List[Incident], complete: bool):
+        self.incidents = incidents
+        self.complete = complete
+
+
+@lru_cache(maxsize=4096)
+def parse_timestamp(value: Optional[str]) -> Optional[datetime]:
+    """An RSS (RFC 822) or Atom (ISO 8601) date as an aware UTC datetime,
+    or None when it cannot be read."""
+    if not value:
+        return None
+    try:
+        parsed = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        try:
+            parsed = datetime.fromisoformat(value.replace('Z', '+00:00'))
+        except ValueError:
+            return None
+    if parsed.tzinfo is None:
+        return parsed.replace(tzinfo=timezone.utc)
+    return parsed.astimezone(timezone.utc)
+
+
+def _changed(entry) -> datetime:
+    """When the entry last changed: the later of its published and updated
+    dates. Atom entries keep ``published`` at creation and move ``updated``."""
+    dates = [parsed for parsed in (parse_timestamp(entry.get('published')), parse_timestamp(entry.get('updated')))
+             if parsed]
+    return max(dates) if dates else datetime.now(timezone.utc)
+
+
+def _published(entry) -> datetime:
+    # feedparser has already parsed the date into a UTC struct_time
+    parsed = entry.get('published_parsed') or entry.get('updated_parsed')
+    if parsed:
+        return datetime(*parsed[:6], tzinfo=timezone.utc)
+    return (parse_timestamp(entry.get('published')) or parse_timestamp(entry.get('updated'))
+            or datetime.now(timezone.utc))
+
+
+def _last_updated(entry) -> str:
+    # An Atom entry that moved its ``updated`` past ``published`` changed
+    # since it was created; its hash has to change with it
+    published, updated = entry.get('published'), entry.get('updated')
+    if updated and (not published or (parse_timestamp(updated) or _EPOCH) > (parse_timestamp(published) or _EPOCH)):
+        return updated
+    return published or updated or str(datetime.now())
+
+
+def entry_to_incident(entry, feed: str = DEFAULT_FEED) -> Incident:
+    """Map a feed entry (feedparser or streamed) to an incident."""
+    published = _published(entry)
+    incident = {
+        'feed': feed,
+        'guid': entry.get('guid', entry.get('id', '')),
+        'title': entry.get('title', 'No title'),
+        'description': entry.get('summary', entry.get('description', '')),
+        'link': entry.get('link', ''),
+        'last_updated': _last_updated(entry),
+        'published': published
+    }
+    incident['entry_hash'] = entry_hash(incident)
+    return incident
+
+
+def _newest_first(incidents: List[Incident]) -> List[Incident]:
+    # Stable, so entries published at the same time keep the feed's order
+    incidents.sort(key=lambda incident: incident['published'], reverse=True)
+    return incidents
+
+
+def entry_hash(incident: Dict) -> str:
+    return content_hash(
+        incident['guid'],
+        incident['title'],
+        incident['description'],
+        incident['link'],
+        incident['last_updated']
+    )
+
+
+def iter_entries(content: bytes) -> Iterator[Dict]:
+    """Yield the entries of an RSS or Atom document as dicts, lazily.
+
+    Every finished item is cleared from the tree, so memory stays flat no
+    matter how long the feed is.
+    """
+    entry = None
+    for event, element in iterparse(BytesIO(content), events=('start', 'end')):
+        tag = element.tag
+        if event == 'start':
+            if tag == 'item' or tag == ATOM + 'entry':
+                entry = {}
+            continue
+
+        if entry is None:
+            continue
+        if tag == 'item' or tag == ATOM + 'entry':
+            yield entry
+            entry = None
+            element.clear()
+        elif tag in _RSS_FIELDS:
+            entry[_RSS_FIELDS[tag]] = (element.text or '').strip()
+        elif tag == ATOM + 'link':
+            if element.get('rel', 'alternate') == 'alternate':
+                entry['link'] = element.get('href', '')
+        elif tag in _ATOM_FIELDS:
+            entry[_ATOM_FIELDS[tag]] = (element.text or '').strip()
+
+
+def _none_newer(content: bytes, skip: int, newest: datetime) -> bool:
+    """Whether every entry after the first ``skip`` is dated ``newest`` or
+    earlier, judged from the raw document. False when unsure."""
+    starts = [match.start() for match in _ENTRY_START.finditer(content)]
+    if len(starts) < skip:
+        return False
+    ends = starts[skip + 1:] + [len(content)]
+    for start, end in zip(starts[skip:], ends):
+        dated = False
+        # Every date of the entry counts, so an Atom entry whose
+        # ``updated`` moved past its ``published`` is caught
+        for match in _DATE.finditer(content, start, end):
+            changed = parse_timestamp(match.group(2).decode('utf-8', 'replace'))
+            if changed is None or changed > newest:
+                return False
+            dated = True
+        # Entries without a recognizable date are read the slow way
+        if not dated:
+            return False
+    return True
+
+
+def read_feed(content: bytes, feed: str = DEFAULT_FEED,
+              is_known: Optional[Callable[[str, str], bool]] = None,
+              stop_after: int = 0) -> FeedSnapshot:
+    """Read a feed document into incidents.
+
+    With ``is_known(guid, entry_hash)`` and ``stop_after`` > 0, entries are
+    no longer mapped to incidents after that many consecutive entries that
+    are known unchanged; those entries are not included in the snapshot.
+    Past that point only the dates of the remaining entries are read, and
+    unknown entries changed (published or updated) after the newest known
+    one are still included: Statuspage lists entries by creation, so an
+    older incident that was updated can sit below unchanged newer ones.
+    """
+    incidents = []
+    known_run = []
+    # Latest change date of the known entries read: anything that changed
+    # since they were last processed is dated later
+    newest_known = None
+    skimming = False
+    read = 0
+    try:
+        for entry in iter_entries(content):
+            read += 1
+            if skimming:
+                if _changed(entry) <= newest_known:
+                    continue
+                incident = entry_to_incident(entry, feed)
+                if not is_known(incident['guid'], incident['entry_hash']):
+                    incidents.append(incident)
+                continue
+            incident = entry_to_incident(entry, feed)
+            if stop_after and is_known and is_known(incident['guid'], incident['entry_hash']):
+                known_run.append(incident)
+                changed = _changed(entry)
+                if newest_known is None or changed > newest_known:
+                    newest_known = changed
+                if len(known_run) >= stop_after:
+                    if _none_newer(content, read, newest_known):
+                        return FeedSnapshot(_newest_first(incidents), complete=False)
+                    known_run = []
+                    skimming = True
+                continue
+            incidents.extend(known_run)
+            known_run = []
+            incidents.append(incident)
+    except ParseError:
+        # Imported lazily: only malformed or exotic documents need it
+        import feedparser
+        parsed = feedparser.parse(content)
+        if parsed.bozo and not parsed.entries:
+            raise ValueError(f"Error parsing feed: {parsed.bozo_exception}")
+        return FeedSnapshot(
+            _newest_first([entry_to_incident(entry, feed) for entry in parsed.entries]), complete=True
+        )
+
+    incidents.extend(known_run)
+    return FeedSnapshot(_newest_first(incidents), complete=not skimming)
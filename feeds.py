@@ -0,0 +1,93 @@
+"""
+Feed definitions for monitoring several status pages from one process.
+
+Without ``FEEDS_FILE`` the bot watches the single ``RSS_FEED_URL`` and
+posts to ``TELEGRAM_CHANNEL_ID``. With it, the file holds a JSON list of
+feeds, for example::
+
+    [
+        {
+            "name": "lovable",
+            "url": "https://status.lovable.dev/feed.rss",
+            "interval_minutes": 5,
+            "channels": ["@lovable_status"],
+            "statuses": ["Investigating", "Identified", "Monitoring"],
+            "include": [],
+            "exclude": ["maintenance"],
+            "debounce_seconds": 60
+        }
+    ]
+
+``debounce_seconds`` holds edits of an incident back so quick status
+changes go out as one edit (``EDIT_DEBOUNCE_SECONDS`` when omitted).
+``name`` keys the feed's incidents in the database and must stay stable.
+Name the feed that replaces the old single-feed setup ``default`` to keep
+its posting history.
+"""
+import json
+from typing import Dict, List, Optional
+
+from storage import DEFAULT_FEED
+
+
+class FeedConfig:
+    def __init__(self, name: str, url: str, interval_minutes: float, channels: List[str],
+                 statuses: Optional[List[str]] = None, include: Optional[List[str]] = None,
+                 exclude: Optional[List[str]] = None, debounce_seconds: float = 0):
+        self.name = name
+        self.url = url
+        self.interval_minutes = interval_minutes
+        self.channels = [str(channel) for channel in channels]
+        self.statuses = set(statuses or [])
+        self.include = [keyword.lower() for keyword in include or []]
+        self.exclude = [keyword.lower() for keyword in exclude or []]
+        self.debounce_seconds = debounce_seconds
+
+    def matches(self, incident: Dict) -> bool:
+        """Whether a new incident should be posted for this feed."""
+        if self.statuses and incident['status'] not in self.statuses:
+            return False
+        title = incident['title'].lower()
+        if self.include and not any(keyword in title for keyword in self.include):
+            return False
+        return not any(keyword in title for keyword in self.exclude)
+
+    def __repr__(self):
+        return f"FeedConfig({self.name!r}, {self.url!r})"
+
+
+def load_feeds(config) -> List[FeedConfig]:
+    if not config.FEEDS_FILE:
+        return [FeedConfig(
+            DEFAULT_FEED,
+            config.RSS_FEED_URL,
+            config.CHECK_INTERVAL_MINUTES,
+            [config.TELEGRAM_CHANNEL_ID],
+            debounce_seconds=config.EDIT_DEBOUNCE_SECONDS
+        )]
+
+    with open(config.FEEDS_FILE) as f:
+        definitions = json.load(f)
+
+    feeds = []
+    for definition in definitions:
+        channels = definition.get('channels') or [
+            channel for channel in [config.TELEGRAM_CHANNEL_ID] if channel
+        ]
+        if not channels:
+            raise ValueError(f"Feed {definition['name']} has no channels and TELEGRAM_CHANNEL_ID is not set")
+        feeds.append(FeedConfig(
+            definition['name'],
+            definition['url'],
+            definition.get('interval_minutes', config.CHECK_INTERVAL_MINUTES),
+            channels,
+            statuses=definition.get('statuses'),
+            include=definition.get('include'),
+            exclude=definition.get('exclude'),
+            debounce_seconds=definition.get('debounce_seconds', config.EDIT_DEBOUNCE_SECONDS)
+        ))
+
+    names = [feed.name for feed in feeds]
+    if len(set(names)) != len(names):
+        raise ValueError(f"Feed names in {config.FEEDS_FILE} must be unique")
+    return feeds
@@ -0,0 +1,172 @@
+"""
+In-memory index of the incidents that can still change.
+
+The feed is diffed against ``HotState`` instead of SQLite: the index is
+loaded once at startup with every unresolved incident and every incident
+updated within ``max_age``, then kept current write-through, after each
+cycle is committed and after each delivery. A steady-state poll therefore
+reads nothing from the database; only GUIDs the index does not hold (old
+resolved incidents that were evicted, or the feed's backlog on the first
+poll) are looked up there.
+
+Records use ``__slots__`` and hold only what the diff and the delivery
+decisions need, so thousands of incidents cost a few hundred KiB.
+"""
+import time
+from datetime import timezone
+from typing import Dict, Iterable, List, Optional
+
+from storage import FeedChangeset, categorize_incidents
+
+
+def _date_string(value) -> Optional[str]:
+    return str(value) if value else None
+
+
+class IncidentRecord:
+    __slots__ = ('title', 'status', 'entry_hash', 'content_hash', 'telegram_message_id', 'messages',
+                 'sent_hashes', 'updated_at', 'last_updated')
+
+    def __init__(self, title: str, status: str, entry_hash: Optional[str] = None,
+                 content_hash: Optional[str] = None, telegram_message_id: Optional[int] = None,
+                 messages: Optional[Dict[str, int]] = None, updated_at: Optional[float] = None,
+                 sent_hashes: Optional[Dict[str, str]] = None, last_updated: Optional[str] = None):
+        self.title = title
+        self.status = status
+        self.entry_hash = entry_hash
+        self.content_hash = content_hash
+        self.telegram_message_id = telegram_message_id
+        self.messages = messages or {}
+        # Hash of the text each chat's message shows
+        self.sent_hashes = sent_hashes or {}
+        self.updated_at = updated_at or time.time()
+        # Date of the feed entry or push the stored state came from
+        self.last_updated = last_updated
+
+    def as_incident(self, feed: str, guid: str) -> Dict:
+        """The stored-incident dict the diff hands to ``FeedMonitor.process``."""
+        return {
+            'feed': feed,
+            'guid': guid,
+            'title': self.title,
+            'status': self.status,
+            'entry_hash': self.entry_hash,
+            'content_hash': self.content_hash,
+            'telegram_message_id': self.telegram_message_id,
+            'messages': dict(self.messages),
+            'sent_hashes': dict(self.sent_hashes),
+            'last_updated': self.last_updated
+        }
+
+
+class HotState:
+    def __init__(self, max_age: float = 86400):
+        self.max_age = max_age
+        self.feeds: Dict[str, Dict[str, IncidentRecord]] = {}
+        self.hits = 0
+        self.misses = 0
+        self.evicted = 0
+
+    def _records(self, feed: str) -> Dict[str, IncidentRecord]:
+        return self.feeds.setdefault(feed, {})
+
+    def load(self, incidents: Iterable[Dict]):
+        """Add stored incidents, e.g. from ``DatabaseManager.get_hot_incidents``."""
+        for incident in incidents:
+            observed_at = incident.get('observed_at')
+            self._records(incident['feed'])[incident['guid']] = IncidentRecord(
+                incident['title'],
+                incident['status'],
+                incident.get('entry_hash'),
+                incident.get('content_hash'),
+                incident.get('telegram_message_id'),
+                dict(incident.get('messages') or {}),
+                observed_at.replace(tzinfo=timezone.utc).timestamp() if observed_at else None,
+                dict(incident.get('sent_hashes') or {}),
+                _date_string(incident.get('last_updated'))
+            )
+
+    def missing(self, incidents: List[Dict], feed: str) -> List[str]:
+        """GUIDs of a snapshot the index does not hold, to look up in the database."""
+        records = self._records(feed)
+        guids = [incident['guid'] for incident in incidents if incident['guid'] not in records]
+        self.misses += len(guids)
+        self.hits += len(incidents) - len(guids)
+        return guids
+
+    def diff(self, incidents: List[Dict], feed: str) -> FeedChangeset:
+        """Categorize a snapshot against the index (see ``categorize_incidents``).
+
+        Incidents the index does not hold count as new, so load them with
+        ``missing`` first.
+        """
+        records = self._records(feed)
+        stored = {
+            incident['guid']: records[incident['guid']].as_incident(feed, incident['guid'])
+            for incident in incidents if incident['guid'] in records
+        }
+        return categorize_incidents(incidents, stored)
+
+    def update(self, feed: str, incidents: Iterable[Dict]):
+        """Write through incidents whose new state was committed."""
+        records = self._records(feed)
+        now = time.time()
+        for incident in incidents:
+            record = records.get(incident['guid'])
+            if record is None:
+                records[incident['guid']] = IncidentRecord(
+                    incident['title'], incident['status'], incident.get('entry_hash'), updated_at=now,
+                    last_updated=_date_string(incident.get('last_updated'))
+                )
+            else:
+                record.title = incident['title']
+                record.status = incident['status']
+                record.entry_hash = incident.get('entry_hash')
+                record.updated_at = now
+                record.last_updated = _date_string(incident.get('last_updated'))
+
+    def discard(self, feed: str, guids: Iterable[str]):
+        """Forget incidents, e.g. ones stored under another GUID since."""
+        records = self._records(feed)
+        for guid in guids:
+            records.pop(guid, None)
+
+    def record_delivery(self, feed: str, guid: str, chat_id: str, message_id: int, content_hash: str):
+        """Write through a delivered message."""
+        record = self._records(feed).get(guid)
+        if record is None:
+            return
+        record.messages[str(chat_id)] = message_id
+        record.sent_hashes[str(chat_id)] = content_hash
+        record.content_hash = content_hash
+        if record.telegram_message_id is None:
+            record.telegram_message_id = message_id
+
+    def has_active(self, feed: str) -> bool:
+        return any(record.status != 'Resolved' for record in self._records(feed).values())
+
+    def evict(self, now: Optional[float] = None) -> int:
+        """Drop resolved incidents not updated within ``max_age``."""
+        cutoff = (now or time.time()) - self.max_age
+        evicted = 0
+        for records in self.feeds.values():
+            stale = [
+                guid for guid, record in records.items()
+                if record.status == 'Resolved' and record.updated_at < cutoff
+            ]
+            for guid in stale:
+                del records[guid]
+            evicted += len(stale)
+        self.evicted += evicted
+        return evicted
+
+    def __len__(self):
+        return sum(len(records) for records in self.feeds.values())
+
+    def stats(self) -> Dict:
+        return {
+            'incidents': len(self),
+            'hits': self.hits,
+            'misses': self.misses,
+            'evicted': self.evicted
+        }
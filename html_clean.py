@@ -0,0 +1,57 @@
+"""
+Cleaning of Statuspage incident descriptions for Telegram.
+
+A description looks like::
+
+    <b>Status: Investigating</b><br /><br />Some projects are down.<br /><br />
+    <b>Affected components</b>
+      <ul>
+      <li>Editor (Partial outage)</li>
+      </ul>
+
+``clean_description`` turns it into plain text and the list of affected
+components in one pass over the markup, decodes every HTML entity, and
+caches the result so unchanged descriptions are never cleaned twice.
+"""
+import html
+import re
+from functools import lru_cache
+from typing import Tuple
+
+COMPONENTS_HEADER = '<b>Affected components</b>'
+
+_TAG = re.compile(r'<[^>]+>')
+_COMPONENT = re.compile(r'<li>([^<]+)\([^)]+\)</li>')
+_STATUS_PREFIX = re.compile(r'^Status:\s*(Resolved|Identified|Monitoring|Investigating)\s*', re.IGNORECASE)
+
+
+@lru_cache(maxsize=1024)
+def clean_description(html_text: str) -> Tuple[str, Tuple[str, ...]]:
+    """Return the description as plain text and its affected components."""
+    if not html_text:
+        return '', ()
+
+    # The components section is cut out and parsed on its own, so the
+    # component regex only ever scans that slice of the document
+    components = ()
+    start = html_text.find(COMPONENTS_HEADER)
+    if start != -1:
+        end = html_text.find('</ul>', start)
+        if end != -1:
+            end += len('</ul>')
+            components = tuple(
+                match.strip() for match in _COMPONENT.findall(html_text, start, end)
+            )
+            html_text = html_text[:start] + html_text[end:]
+
+    text = _TAG.sub('', html_text)
+    if '&' in text:
+        text = html.unescape(text)
+    # str.split() collapses every run of whitespace, including the
+    # non-breaking spaces that &nbsp; decodes to
+    text = ' '.join(text.split())
+
+    if text[:7].lower() == 'status:':
+        text = _STATUS_PREFIX.sub('', text)
+
+    return text, components
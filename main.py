@@ -3,18 +3,29 @@ import sys
 import os
 # Add the virtual environment path
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'venv/lib/python3.13/site-packages'))
-import feedparser
-import sqlite3
 import logging
 import asyncio
-import re
-from datetime import datetime
-from typing import Optional, Dict, List
-import requests
-from telegram import Bot
-from telegram.error import TelegramError
-from telegram.constants import ParseMode
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Optional, Dict, List, Set, Tuple
 from config import config
+from feed_fetch import create_async_client, fetch_feed_async, UNCHANGED
+from feed_parser import FeedSnapshot, parse_timestamp, read_feed
+from metrics import (
+    REGISTRY, FEED_FETCH_SECONDS, FEED_FETCH_BYTES, FEED_PARSE_SECONDS, FEED_ENTRIES,
+    FEED_CYCLE_SECONDS, FEED_ERRORS, SCHEDULER_LAG_SECONDS, WEBHOOK_EVENTS, start_metrics_server
+)
+from feeds import FeedConfig, load_feeds
+from scheduler import PollScheduler
+from html_clean import clean_description
+from status_parser import classify_status
+from caching import LRUCache, content_hash
+from storage import DatabaseManager
+from hot_state import HotState
+from subscriptions import SubscriptionIndex, incident_severity
+from telegram_dispatch import TelegramSendQueue
+from outbox import OutboxWorker, make_delivery
+from webhook import PENDING_PREFIX, PayloadError, normalize_statuspage, page_url, pending_guid, start_webhook_server, statuspage_id
 
 logging.basicConfig(
     level=getattr(logging, config.LOG_LEVEL),
@@ -27,131 +38,95 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 
-class DatabaseManager:
-    def __init__(self, db_path: str):
-        self.db_path = db_path
-        self._init_database()
-    
-    def _init_database(self):
-        with sqlite3.connect(self.db_path) as conn:
-            cursor = conn.cursor()
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS incidents (
-                    guid TEXT PRIMARY KEY,
-                    title TEXT NOT NULL,
-                    status TEXT,
-                    description TEXT,
-                    link TEXT,
-                    posted_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    telegram_message_id INTEGER,
-                    last_updated TIMESTAMP
-                )
-            ''')
-            conn.commit()
-            logger.info("Database initialized")
-    
-    def get_incident(self, guid: str) -> Optional[Dict]:
-        with sqlite3.connect(self.db_path) as conn:
-            cursor = conn.cursor()
-            cursor.execute('''
-                SELECT guid, title, status, description, link, telegram_message_id, last_updated
-                FROM incidents WHERE guid = ?
-            ''', (guid,))
-            row = cursor.fetchone()
-            if row:
-                return {
-                    'guid': row[0],
-                    'title': row[1],
-                    'status': row[2],
-                    'description': row[3],
-                    'link': row[4],
-                    'telegram_message_id': row[5],
-                    'last_updated': row[6]
-                }
-            return None
-    
-    def save_incident(self, incident: Dict):
-        with sqlite3.connect(self.db_path) as conn:
-            cursor = conn.cursor()
-            cursor.execute('''
-                INSERT OR REPLACE INTO incidents 
-                (guid, title, status, description, link, telegram_message_id, last_updated)
-                VALUES (?, ?, ?, ?, ?, ?, ?)
-            ''', (
-                incident['guid'],
-                incident['title'],
-                incident.get('status', ''),
-                incident.get('description', ''),
-                incident.get('link', ''),
-                incident.get('telegram_message_id'),
-                incident.get('last_updated', datetime.now())
-            ))
-            conn.commit()
-
-
 class StatusBot:
     def __init__(self):
-        self.bot = Bot(token=config.TELEGRAM_BOT_TOKEN)
-        self.db = DatabaseManager(config.DATABASE_PATH)
-        self.feed_url = config.RSS_FEED_URL
+        # Created on the first Telegram request, see the bot property
+        self._bot = None
+        self.db = DatabaseManager(config.DATABASE_PATH, default_chat_id=config.TELEGRAM_CHANNEL_ID)
+        # Incidents that can still change, so polls diff in memory
+        self.state = HotState(max_age=config.HOT_STATE_MAX_AGE_HOURS * 3600)
+        self.state.load(self.db.get_hot_incidents(
+            datetime.now(timezone.utc) - timedelta(hours=config.HOT_STATE_MAX_AGE_HOURS)
+        ))
+        self.send_queue = TelegramSendQueue(
+            lambda: self.bot,
+            global_rate=config.TELEGRAM_GLOBAL_RATE,
+            chat_rate_per_minute=config.TELEGRAM_CHAT_RATE_PER_MINUTE,
+            max_retries=config.TELEGRAM_MAX_RETRIES,
+            concurrency=config.TELEGRAM_MAX_CONCURRENCY
+        )
+        # Deliveries are queued in the database and sent in the background
+        self.outbox = OutboxWorker(
+            self.db,
+            self.send_queue,
+            batch_size=config.OUTBOX_BATCH_SIZE,
+            retry_seconds=config.OUTBOX_RETRY_SECONDS,
+            max_retry_seconds=config.OUTBOX_MAX_RETRY_MINUTES * 60,
+            max_attempts=config.OUTBOX_MAX_ATTEMPTS,
+            state=self.state
+        )
+        self.render_cache = LRUCache(maxsize=config.RENDER_CACHE_SIZE)
+        self.feeds = load_feeds(config)
+        # Feed downloads share one non-blocking keep-alive connection pool
+        self.http = create_async_client(
+            timeout=config.FEED_TIMEOUT,
+            connect_timeout=config.FEED_CONNECT_TIMEOUT,
+            max_connections=max(10, len(self.feeds))
+        )
+        self.monitors = [FeedMonitor(self, feed) for feed in self.feeds]
+        # Pushed updates being processed; referenced so they are not collected
+        self._push_tasks = set()
+        REGISTRY.register_collector(self._collect_metrics)
+    
+    @property
+    def bot(self):
+        """Bot API client, imported and created on first use so a one-off run
+        with nothing to send does not load python-telegram-bot"""
+        if self._bot is None:
+            from telegram import Bot
+            from telegram.request import HTTPXRequest
+            
+            # One pooled HTTP client shared by all concurrent Telegram requests
+            self._bot = Bot(
+                token=config.TELEGRAM_BOT_TOKEN,
+                base_url=config.TELEGRAM_API_URL,
+                request=HTTPXRequest(connection_pool_size=config.TELEGRAM_MAX_CONCURRENCY)
+            )
+        return self._bot
+    
+    @bot.setter
+    def bot(self, bot):
+        self._bot = bot
         
     def _extract_status_from_text(self, text: str) -> str:
-        text_lower = text.lower()
-        if 'resolved' in text_lower:
-            return 'Resolved'
-        elif 'identified' in text_lower:
-            return 'Identified'
-        elif 'monitoring' in text_lower:
-            return 'Monitoring'
-        elif 'investigating' in text_lower:
-            return 'Investigating'
-        return 'Unknown'
+        """Status of the latest update in a description (see ``classify_status``)"""
+        return classify_status(text).status
     
     def _extract_components(self, html_text: str) -> List[str]:
         """Extract affected components from HTML"""
-        components = []
-        if not html_text:
-            return components
-        
-        # Look for list items within the affected components section
-        component_pattern = r'<li>([^<]+)\s*\([^)]+\)</li>'
-        matches = re.findall(component_pattern, html_text)
-        
-        return [match.strip() for match in matches]
+        return list(clean_description(html_text)[1])
     
-    def _clean_html(self, html_text: str) -> str:
-        """Convert HTML to clean text for Telegram"""
-        if not html_text:
-            return ""
-        
-        # First extract components before cleaning
-        components = self._extract_components(html_text)
-        
-        # Remove the affected components section entirely
-        text = re.sub(r'<b>Affected components</b>.*?</ul>', '', html_text, flags=re.DOTALL)
-        
-        # Remove HTML tags
-        text = re.sub(r'<[^>]+>', '', text)
-        
-        # Replace HTML entities
-        text = text.replace('&nbsp;', ' ')
-        text = text.replace('&amp;', '&')
-        text = text.replace('&lt;', '<')
-        text = text.replace('&gt;', '>')
-        text = text.replace('&quot;', '"')
-        text = text.replace('&#39;', "'")
-        
-        # Clean up extra whitespace
-        text = re.sub(r'\s+', ' ', text)
-        text = re.sub(r'\n\s*\n', '\n', text)
-        
-        # Remove redundant status prefix if it exists
-        status_pattern = r'^Status:\s*(Resolved|Identified|Monitoring|Investigating)\s*'
-        text = re.sub(status_pattern, '', text, flags=re.IGNORECASE)
-        
-        return text.strip(), components
+    def _clean_html(self, html_text: str) -> Tuple[str, List[str]]:
+        """Convert HTML to clean text for Telegram, plus the affected components"""
+        text, components = clean_description(html_text)
+        return text, list(components)
     
     def _format_telegram_message(self, incident: Dict) -> str:
+        """Render an incident, reusing the result for unchanged inputs"""
+        key = content_hash(
+            incident['title'],
+            incident['status'],
+            incident.get('description', ''),
+            incident.get('link', ''),
+            incident.get('last_updated', '')
+        )
+        message = self.render_cache.get(key)
+        if message is None:
+            message = self._render_message(incident)
+            self.render_cache.put(key, message)
+        return message
+    
+    def _render_message(self, incident: Dict) -> str:
         status_emoji = {
             'Resolved': '✅',
             'Identified': '🔍',
@@ -163,11 +138,11 @@ class StatusBot:
         emoji = status_emoji.get(incident['status'], '❓')
         
         # Determine severity based on title/description
-        severity = "🔴 High"
-        if "intermittent" in incident['title'].lower() or "some" in incident['title'].lower():
-            severity = "🟡 Medium"
-        elif incident['status'] == 'Resolved':
-            severity = "🟢 Resolved"
+        severity = {
+            'high': "🔴 High",
+            'medium': "🟡 Medium",
+            'low': "🟢 Resolved"
+        }[incident_severity(incident)]
         
         message = f"🚨 *INCIDENT: {incident['title']}*\n\n"
         message += f"{emoji} *Status:* {incident['status']}\n"
@@ -187,123 +162,86 @@ class StatusBot:
         if incident.get('link'):
             message += f"\n🔗 [View Details]({incident['link']})\n"
         
-        timestamp = incident.get('last_updated', datetime.now())
-        if isinstance(timestamp, str):
-            # Handle RSS date format: "Fri, 18 Jul 2025 13:27:33 GMT"
-            try:
-                from email.utils import parsedate_to_datetime
-                timestamp = parsedate_to_datetime(timestamp)
-            except:
-                try:
-                    timestamp = datetime.fromisoformat(timestamp.replace('Z', '+00:00'))
-                except:
-                    timestamp = datetime.now()
+        timestamp = incident.get('published') or parse_timestamp(incident.get('last_updated')) \
+            or datetime.now(timezone.utc)
         
         message += f"\n⏰ _Updated: {timestamp.strftime('%Y-%m-%d %H:%M UTC')}_"
         
         return message
     
-    async def send_telegram_message(self, text: str, message_id: Optional[int] = None) -> Optional[int]:
+    async def send_telegram_message(self, text: str, message_id: Optional[int] = None,
+                                    chat_id: Optional[str] = None) -> Optional[int]:
+        return await self.send_queue.send(chat_id or config.TELEGRAM_CHANNEL_ID, text, message_id)
+    
+    def _collect_metrics(self):
+        """Expose the send queue and monitor counters at scrape time"""
+        queue = self.send_queue.stats()
+        yield 'telegram_queue_depth', 'gauge', 'Messages waiting to be sent', {}, queue['queue_depth']
+        for outcome in ('sent', 'edited', 'replaced', 'retries', 'failed', 'skipped_edits'):
+            yield ('telegram_messages_total', 'counter', 'Queued messages by outcome',
+                   {'outcome': outcome}, queue[outcome])
+        yield 'telegram_queue_wait_max_seconds', 'gauge', 'Longest queue wait so far', {}, queue['wait_max']
+        outbox = self.outbox.stats()
+        yield 'outbox_pending', 'gauge', 'Deliveries waiting in the outbox', {}, outbox['pending']
+        for outcome in ('delivered', 'retried', 'dead'):
+            yield ('outbox_deliveries_total', 'counter', 'Outbox deliveries by outcome',
+                   {'outcome': outcome}, outbox[outcome])
+        hot = self.state.stats()
+        yield 'hot_state_incidents', 'gauge', 'Incidents held in the in-memory index', {}, hot['incidents']
+        yield 'hot_state_hits_total', 'counter', 'Feed entries found in the in-memory index', {}, hot['hits']
+        yield 'hot_state_misses_total', 'counter', 'Feed entries looked up in the database', {}, hot['misses']
+        yield 'hot_state_evicted_total', 'counter', 'Resolved incidents evicted from the index', {}, hot['evicted']
+        yield 'render_cache_hits_total', 'counter', 'Rendered message cache hits', {}, self.render_cache.hits
+        yield 'render_cache_misses_total', 'counter', 'Rendered message cache misses', {}, self.render_cache.misses
+        for monitor in self.monitors:
+            stats = monitor.stats()
+            labels = {'feed': monitor.feed.name}
+            yield 'feed_fetches_total', 'counter', 'Feed downloads', labels, stats['fetches']
+            yield ('feed_skipped_fetches_total', 'counter', 'Downloads skipped as not modified or unchanged',
+                   labels, stats['skipped_fetches'])
+            yield 'feed_poll_interval_seconds', 'gauge', 'Current poll interval', labels, stats['poll_interval']
+            yield 'feed_active', 'gauge', '1 while the feed has an unresolved incident', labels, int(stats['active'])
+    
+    async def close(self):
+        """Stop the outbox and send queue and release HTTP connections and the database"""
+        await self.outbox.close()
+        await self.send_queue.close()
+        await self.http.aclose()
+        if self._bot is not None:
+            await self._bot.shutdown()
+        self.db.close()
+    
+    async def handle_push(self, feed_name: str, payload: Dict, received_at: float) -> bool:
+        """Queue a Statuspage webhook payload for the named feed; raises
+        PayloadError for a malformed payload"""
+        monitor = next((monitor for monitor in self.monitors if monitor.feed.name == feed_name), None)
+        if monitor is None:
+            WEBHOOK_EVENTS.inc(feed=feed_name, result='unknown_feed')
+            return False
         try:
-            if message_id:
-                result = await self.bot.edit_message_text(
-                    chat_id=config.TELEGRAM_CHANNEL_ID,
-                    message_id=message_id,
-                    text=text,
-                    parse_mode=ParseMode.MARKDOWN,
-                    disable_web_page_preview=True
-                )
-                logger.info(f"Updated message {message_id}")
-                return message_id
-            else:
-                result = await self.bot.send_message(
-                    chat_id=config.TELEGRAM_CHANNEL_ID,
-                    text=text,
-                    parse_mode=ParseMode.MARKDOWN,
-                    disable_web_page_preview=True
-                )
-                logger.info(f"Sent new message {result.message_id}")
-                return result.message_id
-        except TelegramError as e:
-            logger.error(f"Failed to send/update Telegram message: {e}")
-            return None
+            incident = normalize_statuspage(payload, feed_name, page_url(monitor.feed.url))
+        except PayloadError:
+            WEBHOOK_EVENTS.inc(feed=feed_name, result='invalid')
+            raise
+        if incident is None:
+            # Component-only and other events carry no incident to post
+            WEBHOOK_EVENTS.inc(feed=feed_name, result='ignored')
+            return True
+        WEBHOOK_EVENTS.inc(feed=feed_name, result='accepted')
+        # Answer the webhook right away; delivery happens in the background
+        task = asyncio.create_task(monitor.ingest(incident, received_at))
+        self._push_tasks.add(task)
+        task.add_done_callback(self._push_tasks.discard)
+        return True
     
     async def fetch_and_process_feed(self):
-        logger.info("Fetching RSS feed...")
-        
-        try:
-            feed = feedparser.parse(self.feed_url)
-            
-            if feed.bozo:
-                logger.error(f"Error parsing feed: {feed.bozo_exception}")
-                return
-            
-            logger.info(f"Found {len(feed.entries)} entries in feed")
-            
-            # Sort entries by date (newest first) to process in correct order
-            entries = sorted(feed.entries, key=lambda x: x.get('published', ''), reverse=True)
-            
-            for entry in entries:
-                incident = {
-                    'guid': entry.get('guid', entry.get('id', '')),
-                    'title': entry.get('title', 'No title'),
-                    'description': entry.get('summary', entry.get('description', '')),
-                    'link': entry.get('link', ''),
-                    'last_updated': entry.get('published', entry.get('updated', str(datetime.now())))
-                }
-                
-                incident['status'] = self._extract_status_from_text(
-                    incident['description'] + ' ' + incident['title']
-                )
-                
-                existing = self.db.get_incident(incident['guid'])
-                
-                if existing:
-                    if existing['status'] != incident['status'] or existing['title'] != incident['title']:
-                        logger.info(f"Status update for incident: {incident['title']}")
-                        
-                        message = self._format_telegram_message(incident)
-                        message_id = await self.send_telegram_message(
-                            message, 
-                            existing.get('telegram_message_id')
-                        )
-                        
-                        if message_id:
-                            incident['telegram_message_id'] = message_id
-                            self.db.save_incident(incident)
-                else:
-                    # Skip resolved incidents if configured
-                    if config.ONLY_ACTIVE_INCIDENTS and incident['status'] == 'Resolved':
-                        logger.info(f"Skipping resolved incident: {incident['title']}")
-                        continue
-                    
-                    # Skip old incidents on initial load
-                    if config.INITIAL_LOAD_DAYS > 0:
-                        try:
-                            from email.utils import parsedate_to_datetime
-                            incident_date = parsedate_to_datetime(incident['last_updated'])
-                            days_old = (datetime.now(incident_date.tzinfo) - incident_date).days
-                            if days_old > config.INITIAL_LOAD_DAYS:
-                                logger.info(f"Skipping old incident ({days_old} days): {incident['title']}")
-                                continue
-                        except:
-                            pass
-                    
-                    logger.info(f"New incident found: {incident['title']} - Status: {incident['status']}")
-                    
-                    message = self._format_telegram_message(incident)
-                    message_id = await self.send_telegram_message(message)
-                    
-                    if message_id:
-                        incident['telegram_message_id'] = message_id
-                        self.db.save_incident(incident)
-                        
-        except Exception as e:
-            logger.error(f"Error processing feed: {e}", exc_info=True)
+        """Poll every configured feed once, concurrently"""
+        await asyncio.gather(*(monitor.poll() for monitor in self.monitors))
     
     async def run_once(self):
-        """Run the bot once for testing"""
+        """Poll every feed once and deliver what is due, e.g. from cron"""
         await self.fetch_and_process_feed()
+        await self.outbox.drain()
     
     async def run_forever(self):
         """Run the bot continuously"""
@@ -315,26 +253,416 @@ class StatusBot:
             logger.error(f"Configuration error: {e}")
             return
         
-        # Initial run
-        await self.fetch_and_process_feed()
+        logger.info(f"Bot started. Monitoring {len(self.monitors)} feeds...")
+        
+        if config.METRICS_PORT:
+            await start_metrics_server(config.METRICS_HOST, config.METRICS_PORT)
+        if config.WEBHOOK_PORT:
+            await start_webhook_server(
+                config.WEBHOOK_HOST, config.WEBHOOK_PORT, self.handle_push, config.WEBHOOK_SECRET or None
+            )
         
-        logger.info(f"Bot started. Checking feed every {config.CHECK_INTERVAL_MINUTES} minutes...")
+        # Deliveries left over from a previous run go out first
+        self.outbox.start()
         
-        # Run periodically
+        # Every feed runs on its own schedule
+        await asyncio.gather(*(monitor.run_forever() for monitor in self.monitors))
+
+
+class FeedMonitor:
+    """Polls a single feed on its own schedule.
+    
+    Validators, counters and filters are per feed, so a slow or failing feed
+    never holds up the others.
+    """
+    
+    def __init__(self, bot: StatusBot, feed: FeedConfig):
+        self.bot = bot
+        self.db = bot.db
+        self.feed = feed
+        self.fetch_count = 0
+        self.skipped_fetches = 0
+        # With webhooks on, polling only reconciles pushes that were missed
+        interval_minutes = feed.interval_minutes
+        if config.WEBHOOK_PORT:
+            interval_minutes = max(interval_minutes, config.WEBHOOK_RECONCILE_MINUTES)
+        self.scheduler = PollScheduler(
+            interval_minutes * 60,
+            mode=config.POLL_MODE,
+            active_seconds=config.POLL_ACTIVE_SECONDS,
+            max_seconds=config.POLL_MAX_MINUTES * 60,
+            backoff=config.POLL_BACKOFF,
+            jitter=config.POLL_JITTER
+        )
+        # Whether the last processed snapshot had an unresolved incident we
+        # posted; drives the adaptive schedule
+        self.active = None
+        self.last_poll_duration = 0.0
+        self.last_cycle = {}
+        # Entry hash of every entry in the last processed snapshot and
+        # whether it is an unresolved incident we posted, by GUID. None
+        # until the whole feed has been read once.
+        self.seen: Optional[Dict[str, Tuple[str, bool]]] = None
+        self._lock = asyncio.Lock()
+        # Chats subscribed to this feed besides its own channels
+        self.subscriptions = SubscriptionIndex()
+        self._subscription_keys = None
+        self._data_version = None
+        # Validators of the last processed response, read from the database
+        # on the first poll only
+        self.validators: Optional[Dict] = None
+        self._validators_loaded = False
+    
+    async def _load_subscriptions(self):
+        # Subscriptions are changed from another process; skip the query
+        # until the database was written by another connection
+        data_version = await self.db.run(self.db.data_version)
+        if data_version == self._data_version:
+            return
+        self._data_version = data_version
+        subscriptions = await self.db.run(self.db.get_subscriptions, self.feed.name)
+        keys = [subscription.key() for subscription in subscriptions]
+        if keys != self._subscription_keys:
+            self.subscriptions = SubscriptionIndex(subscriptions)
+            self._subscription_keys = keys
+            logger.info(f"[{self.feed.name}] Loaded {len(self.subscriptions)} subscriptions")
+    
+    def _targets(self, incident: Dict) -> List[str]:
+        """Chats that should have a copy of the incident: the feed's channels
+        if its filters match, then every matching subscriber"""
+        chats = list(self.feed.channels) if self.feed.matches(incident) else []
+        if self.subscriptions:
+            components = self.bot._extract_components(incident.get('description', ''))
+            matched = self.subscriptions.match(components, incident['status'], incident_severity(incident))
+            chats.extend(sorted(chat for chat in matched if chat not in chats))
+        return chats
+    
+    @staticmethod
+    def _is_stale(incident: Dict, stored: Dict) -> bool:
+        """Whether an update is dated before the state already stored, e.g. a
+        feed entry the push that was stored is newer than"""
+        updated = parse_timestamp(incident.get('last_updated'))
+        stored_at = parse_timestamp(stored.get('last_updated'))
+        return bool(updated and stored_at and updated < stored_at)
+    
+    def _is_known(self, guid: str, entry_hash: str) -> bool:
+        return self.seen.get(guid, (None, False))[0] == entry_hash
+    
+    def _remember(self, snapshot: FeedSnapshot, active: Set[str]):
+        if snapshot.complete:
+            self.seen = {}
+        for incident in snapshot.incidents:
+            self.seen[incident['guid']] = (incident['entry_hash'], incident['guid'] in active)
+    
+    def _any_active(self, snapshot: FeedSnapshot, active: Set[str]) -> bool:
+        if active or snapshot.complete:
+            return bool(active)
+        # Entries past the point where reading stopped are unchanged
+        read = {incident['guid'] for incident in snapshot.incidents}
+        return any(is_active for guid, (_, is_active) in self.seen.items() if guid not in read)
+    
+    async def poll(self):
+        name = self.feed.name
+        logger.info(f"[{name}] Fetching RSS feed...")
+        
+        validators = None
+        started = time.perf_counter()
+        
+        try:
+            if not self._validators_loaded:
+                self.validators = await self.db.run(self.db.get_feed_validators, self.feed.url)
+                self._validators_loaded = True
+            previous = self.validators
+            fetch_started = time.perf_counter()
+            result = await fetch_feed_async(self.feed.url, previous, self.bot.http)
+            FEED_FETCH_SECONDS.observe(time.perf_counter() - fetch_started, feed=name, status=result.status)
+            if result.content:
+                FEED_FETCH_BYTES.inc(len(result.content), feed=name)
+            self.fetch_count += 1
+            
+            if not result.changed:
+                self.skipped_fetches += 1
+                if result.status == UNCHANGED:
+                    # Same body under new validators, keep them for the next poll
+                    validators = result.validators
+                logger.info(
+                    f"[{name}] Feed not changed ({result.status}), skipping processing "
+                    f"({self.skipped_fetches}/{self.fetch_count} fetches skipped)"
+                )
+                return
+            
+            # Past a run of entries that are unchanged since the last
+            # processed poll, only entries dated after them are read. The
+            # first poll after startup reads the whole feed.
+            with FEED_PARSE_SECONDS.time(feed=name):
+                snapshot = read_feed(
+                    result.content,
+                    feed=name,
+                    is_known=self._is_known,
+                    stop_after=config.FEED_KNOWN_RUN if self.seen is not None else 0
+                )
+            incidents = snapshot.incidents
+            FEED_ENTRIES.inc(len(incidents), feed=name)
+            logger.info(
+                f"[{name}] Read {len(incidents)} entries from feed"
+                + ("" if snapshot.complete else " (skipped known entries)")
+            )
+            
+            for incident in incidents:
+                incident['status'] = classify_status(
+                    incident['description'], incident['title'], incident['published']
+                ).status
+            
+            active = await self.process(incidents, result.validators)
+            self._remember(snapshot, active)
+            self.active = self._any_active(snapshot, active)
+                        
+        except Exception as e:
+            FEED_ERRORS.inc(feed=name)
+            logger.error(f"[{name}] Error processing feed: {e}", exc_info=True)
+        finally:
+            if validators:
+                await self.db.run(self._commit_cycle, [], validators)
+                self.validators = validators
+            FEED_CYCLE_SECONDS.observe(time.perf_counter() - started, feed=name)
+    
+    async def ingest(self, incident: Dict, received_at: float):
+        """Queue a pushed incident update without waiting for the next poll"""
+        name = self.feed.name
+        logger.info(f"[{name}] Pushed update: {incident['title']} - Status: {incident['status']}")
+        try:
+            active = await self.process([incident], source='webhook', received_at=received_at)
+            if active:
+                self.active = True
+        except Exception as e:
+            logger.error(f"[{name}] Error processing pushed update: {e}", exc_info=True)
+    
+    async def _resolve_pushed(self, incident: Dict) -> Dict:
+        """A pushed incident under the GUID of its stored copy, if there is one"""
+        incident_id = incident['guid'][len(PENDING_PREFIX):]
+        guid = await self.db.run(
+            self.db.find_incident_guid, f'/incidents/{incident_id}', incident['guid'], self.feed.name
+        )
+        return dict(incident, guid=guid) if guid else incident
+    
+    async def _adopt_pushed(self, incidents: List[Dict]) -> Dict[str, Dict]:
+        """Re-key incidents that were pushed before their feed entries were
+        seen to the entries' GUIDs; returns them as stored, by new GUID"""
+        guids = {}
+        for incident in incidents:
+            incident_id = statuspage_id(incident['guid']) or statuspage_id(incident.get('link'))
+            if incident_id:
+                guids[pending_guid(incident_id)] = incident['guid']
+        if not guids:
+            return {}
+        renamed = await self.db.run(self.db.rename_incidents, guids, self.feed.name)
+        if not renamed:
+            return {}
+        logger.info(f"[{self.feed.name}] Matched {len(renamed)} pushed incidents to their feed entries")
+        self.bot.state.discard(self.feed.name, [old for old, new in guids.items() if new in renamed])
+        return await self.db.run(self.db.get_incidents, renamed, self.feed.name)
+    
+    async def process(self, incidents: List[Dict], validators: Optional[Dict] = None,
+                      source: str = 'poll', received_at: Optional[float] = None) -> Set[str]:
+        """Store new and changed incidents and queue their messages.
+        
+        ``incidents`` come from a feed snapshot or a webhook push. The
+        incidents, their outbox rows and ``validators`` are committed in one
+        transaction; the outbox worker sends them. Returns the GUIDs of the
+        unresolved incidents we have posted or queued.
+        """
+        name = self.feed.name
+        created_at = received_at or time.time()
+        # Incidents to store and their deliveries, written together
+        changed = []
+        deliveries = []
+        # (GUID, chat) messages whose posted text is current again
+        cancelled = []
+        
+        # Polls and pushes of the same feed must not both see an incident
+        # as new and queue it twice
+        async with self._lock:
+            await self._load_subscriptions()
+            if source == 'webhook':
+                incidents = [await self._resolve_pushed(incident) for incident in incidents]
+            # Diff against the in-memory index; only entries it does not
+            # hold are looked up, with one query for all of them
+            missing = self.bot.state.missing(incidents, name)
+            if missing:
+                stored = await self.db.run(self.db.get_incidents, missing, name)
+                unknown = [incident for incident in incidents if incident['guid'] not in stored]
+                if unknown and source != 'webhook':
+                    stored.update(await self._adopt_pushed(unknown))
+                self.bot.state.load(stored.values())
+            changes = self.bot.state.diff(incidents, name)
+            # An update older than the stored state must not roll it back:
+            # a pushed resolution stands until the feed entry catches up
+            stale = [(incident, existing) for incident, existing in changes.changed
+                     if self._is_stale(incident, existing)]
+            if stale:
+                changes.changed = [change for change in changes.changed if change not in stale]
+                for incident, existing in stale:
+                    logger.info(
+                        f"[{name}] Skipping stale update for incident: {incident['title']} "
+                        f"({incident['status']}, stored {existing['status']})"
+                    )
+            logger.info(f"[{name}] Feed changes: {changes}")
+            cycle = {'new': 0, 'updated': 0, 'skipped_edits': 0, 'queued': 0, 'coalesced': 0}
+            
+            def queue(incident: Dict, chats: List[str], edits: Tuple[str, ...] = ()):
+                # Edits of copies already posted wait out the debounce window;
+                # first messages go out right away
+                message = self.bot._format_telegram_message(incident)
+                deliveries.extend(
+                    make_delivery(
+                        name, incident['guid'], chat, message, source, created_at,
+                        delay=self.feed.debounce_seconds if chat in edits else 0
+                    )
+                    for chat in chats
+                )
+            
+            now = datetime.now(timezone.utc)
+            for incident in changes.new:
+                # Skip resolved incidents if configured
+                if config.ONLY_ACTIVE_INCIDENTS and incident['status'] == 'Resolved':
+                    logger.info(f"[{name}] Skipping resolved incident: {incident['title']}")
+                    continue
+                
+                targets = self._targets(incident)
+                if not targets:
+                    logger.info(f"[{name}] Skipping filtered incident: {incident['title']}")
+                    continue
+                
+                # Skip old incidents on initial load
+                if config.INITIAL_LOAD_DAYS > 0 and incident.get('published'):
+                    days_old = (now - incident['published']).days
+                    if days_old > config.INITIAL_LOAD_DAYS:
+                        logger.info(f"[{name}] Skipping old incident ({days_old} days): {incident['title']}")
+                        continue
+                
+                logger.info(f"[{name}] New incident found: {incident['title']} - Status: {incident['status']}")
+                changed.append(incident)
+                queue(incident, targets)
+                cycle['new'] += 1
+            
+            for incident, existing in changes.changed:
+                logger.info(f"[{name}] Status update for incident: {incident['title']}")
+                changed.append(incident)
+                # Every copy already posted is edited, and chats whose
+                # filters match only now get a new one
+                targets = list(existing['messages'])
+                targets.extend(chat for chat in self._targets(incident) if chat not in existing['messages'])
+                
+                # A title tweak or status flap can render to the exact text a
+                # chat already shows; that chat is left alone, and an edit of
+                # it that is still queued is dropped
+                digest = content_hash(self.bot._format_telegram_message(incident))
+                current = [chat for chat in existing['messages'] if existing['sent_hashes'].get(chat) == digest]
+                if current:
+                    cancelled.extend((incident['guid'], chat) for chat in current)
+                    cycle['skipped_edits'] += len(current)
+                    targets = [chat for chat in targets if chat not in current]
+                if not targets:
+                    logger.info(f"[{name}] Rendered message unchanged, skipping edit")
+                    continue
+                
+                queue(incident, targets, tuple(existing['messages']))
+                cycle['updated'] += 1
+            
+            # Channels and subscribers added since still get a copy of every
+            # incident that is not resolved yet. Deliveries that are still
+            # queued are kept as they are, and ones given up on are not
+            # revived.
+            unposted = []
+            for incident, existing in changes.unchanged:
+                if incident['status'] != 'Resolved':
+                    chats = [chat for chat in self._targets(incident) if chat not in existing['messages']]
+                    if chats:
+                        unposted.append((incident, chats))
+            if unposted:
+                queued = await self.db.run(self.db.get_queued_messages, name)
+                for incident, chats in unposted:
+                    chats = [chat for chat in chats if (incident['guid'], chat) not in queued]
+                    if chats:
+                        queue(incident, chats)
+            
+            cycle['queued'] = len(deliveries)
+            cycle['coalesced'] = await self.db.run(self._commit_cycle, changed, validators, deliveries, cancelled)
+            if validators:
+                self.validators = validators
+            self.bot.state.update(name, changed)
+            self.bot.state.evict()
+            if deliveries:
+                self.bot.outbox.notify()
+            
+            self.last_cycle = cycle
+            logger.info(f"[{name}] Cycle stats: {cycle}")
+        
+        posted = changed + [incident for incident, _ in changes.changed + changes.unchanged] \
+            + [existing for _, existing in stale]
+        return {incident['guid'] for incident in posted if incident['status'] != 'Resolved'}
+    
+    def stats(self) -> Dict:
+        return {
+            'fetches': self.fetch_count,
+            'skipped_fetches': self.skipped_fetches,
+            'poll_mode': self.scheduler.mode,
+            'poll_interval': self.scheduler.current_interval,
+            'last_poll_duration': self.last_poll_duration,
+            'active': bool(self.active),
+            'last_cycle': self.last_cycle
+        }
+    
+    def _commit_cycle(self, incidents: List[Dict], validators: Optional[Dict],
+                      deliveries: List[Dict] = (), cancelled: List[Tuple[str, str]] = ()) -> int:
+        """Store a cycle in one transaction; returns the pending edits merged"""
+        with self.db.transaction():
+            self.db.save_incident_states(incidents)
+            self.db.cancel_deliveries(self.feed.name, cancelled)
+            coalesced = self.db.enqueue_deliveries(deliveries)
+            if validators:
+                self.db.save_feed_validators(self.feed.url, validators)
+        return coalesced
+    
+    async def run_forever(self):
+        if self.active is None:
+            self.active = self.bot.state.has_active(self.feed.name)
         while True:
-            await asyncio.sleep(config.CHECK_INTERVAL_MINUTES * 60)
-            await self.fetch_and_process_feed()
+            started = time.monotonic()
+            await self.poll()
+            self.last_poll_duration = time.monotonic() - started
+            
+            delay = self.scheduler.next_delay(self.active, self.last_poll_duration)
+            logger.info(
+                f"[{self.feed.name}] Poll took {self.last_poll_duration:.2f}s, next in {delay:.0f}s "
+                f"({self.scheduler.mode}, interval {self.scheduler.current_interval:.0f}s, "
+                f"{'active' if self.active else 'quiet'})"
+            )
+            due = time.monotonic() + delay
+            await asyncio.sleep(delay)
+            SCHEDULER_LAG_SECONDS.observe(max(0.0, time.monotonic() - due), feed=self.feed.name)
 
 
-async def main():
+async def main(once: bool = False):
+    if once:
+        try:
+            config.validate()
+        except ValueError as e:
+            logger.error(f"Configuration error: {e}")
+            return
     bot = StatusBot()
     try:
-        await bot.run_forever()
+        if once:
+            await bot.run_once()
+        else:
+            await bot.run_forever()
     except KeyboardInterrupt:
         logger.info("Bot stopped by user")
     except Exception as e:
         logger.error(f"Unexpected error: {e}", exc_info=True)
+    finally:
+        await bot.close()
 
 
 if __name__ == "__main__":
-    asyncio.run(main())
\ No newline at end of file
+    asyncio.run(main(once='--once' in sys.argv[1:]))
\ No newline at end of file
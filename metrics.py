@@ -0,0 +1,202 @@
+"""
+Prometheus-style metrics for the bot.
+
+Counters and histograms are plain in-process objects that cost a dict
+lookup and a few additions per observation, so every stage of a feed
+cycle can be timed all the time. ``REGISTRY.render()`` produces the
+Prometheus text exposition format and ``start_metrics_server`` serves it
+on ``/metrics``; no client library is needed.
+"""
+import bisect
+import logging
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, Iterator, List, Tuple
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# (name, type, help, labels, value) produced by collectors at scrape time
+Sample = Tuple[str, str, str, Dict[str, str], float]
+
+
+def _escape(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(labels: Dict) -> str:
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in labels.items()) + '}'
+
+
+def _format_value(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+class Counter:
+    kind = 'counter'
+
+    def __init__(self, name: str, help: str, labels: Tuple[str, ...] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = labels
+        self._values: Dict[tuple, float] = {}
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        self._values[key] = self._values.get(key, 0.0) + amount
+
+    def render(self) -> List[str]:
+        return [
+            f'{self.name}{_format_labels(dict(zip(self.labelnames, key)))} {_format_value(value)}'
+            for key, value in sorted(self._values.items())
+        ]
+
+
+class Histogram:
+    kind = 'histogram'
+
+    def __init__(self, name: str, help: str, labels: Tuple[str, ...] = (),
+                 buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = labels
+        self.buckets = tuple(sorted(buckets))
+        # Per label set: [count per bucket (non-cumulative, last is +Inf), sum, count]
+        self._values: Dict[tuple, list] = {}
+
+    def observe(self, value: float, **labels):
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        state = self._values.get(key)
+        if state is None:
+            state = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+        state[0][bisect.bisect_left(self.buckets, value)] += 1
+        state[1] += value
+        state[2] += 1
+
+    @contextmanager
+    def time(self, **labels) -> Iterator[None]:
+        """Observe the wall time of the ``with`` block."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def render(self) -> List[str]:
+        lines = []
+        for key, (counts, total, count) in sorted(self._values.items()):
+            labels = dict(zip(self.labelnames, key))
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += bucket_count
+                bucket_labels = dict(labels, le=_format_value(bound))
+                lines.append(f'{self.name}_bucket{_format_labels(bucket_labels)} {cumulative}')
+            lines.append(f'{self.name}_sum{_format_labels(labels)} {_format_value(total)}')
+            lines.append(f'{self.name}_count{_format_labels(labels)} {count}')
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: List = []
+        self._collectors: List[Callable[[], Iterable[Sample]]] = []
+
+    def counter(self, name: str, help: str, labels: Tuple[str, ...] = ()) -> Counter:
+        metric = Counter(name, help, labels)
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(self, name: str, help: str, labels: Tuple[str, ...] = (),
+                  buckets: Tuple[float, ...] = DEFAULT_BUCKETS) -> Histogram:
+        metric = Histogram(name, help, labels, buckets)
+        self._metrics.append(metric)
+        return metric
+
+    def register_collector(self, collector: Callable[[], Iterable[Sample]]):
+        """Add a callback that reports values kept elsewhere, e.g. ``stats()``."""
+        self._collectors.append(collector)
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics:
+            lines.append(f'# HELP {metric.name} {metric.help}')
+            lines.append(f'# TYPE {metric.name} {metric.kind}')
+            lines.extend(metric.render())
+
+        described = set()
+        for collector in self._collectors:
+            for name, kind, help, labels, value in collector():
+                if name not in described:
+                    described.add(name)
+                    lines.append(f'# HELP {name} {help}')
+                    lines.append(f'# TYPE {name} {kind}')
+                lines.append(f'{name}{_format_labels(labels)} {_format_value(value)}')
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = Registry()
+
+FEED_FETCH_SECONDS = REGISTRY.histogram(
+    'feed_fetch_seconds', 'Time to download a feed (or get a 304)', ('feed', 'status'))
+FEED_FETCH_BYTES = REGISTRY.counter(
+    'feed_fetch_bytes_total', 'Feed bytes downloaded', ('feed',))
+FEED_PARSE_SECONDS = REGISTRY.histogram(
+    'feed_parse_seconds', 'Time to read a feed document into incidents', ('feed',))
+FEED_ENTRIES = REGISTRY.counter(
+    'feed_entries_total', 'Feed entries read into incidents', ('feed',))
+FEED_CYCLE_SECONDS = REGISTRY.histogram(
+    'feed_cycle_seconds', 'Duration of a whole poll of one feed', ('feed',))
+FEED_ERRORS = REGISTRY.counter(
+    'feed_errors_total', 'Polls that failed with an exception', ('feed',))
+SCHEDULER_LAG_SECONDS = REGISTRY.histogram(
+    'scheduler_lag_seconds', 'How late a poll started compared to its schedule', ('feed',),
+    buckets=(0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0))
+DB_QUERY_SECONDS = REGISTRY.histogram(
+    'db_query_seconds', 'Time spent in a database call on the SQLite thread', ('query',))
+TELEGRAM_REQUEST_SECONDS = REGISTRY.histogram(
+    'telegram_request_seconds', 'Bot API request latency', ('method',))
+TELEGRAM_ERRORS = REGISTRY.counter(
+    'telegram_errors_total', 'Bot API requests that failed, by error code', ('method', 'code'))
+OUTBOX_DELIVERY_SECONDS = REGISTRY.histogram(
+    'outbox_delivery_seconds', 'Time from queueing a delivery to Telegram accepting it', ('source',))
+WEBHOOK_EVENTS = REGISTRY.counter(
+    'webhook_events_total', 'Webhook payloads received, by outcome', ('feed', 'result'))
+WEBHOOK_TO_TELEGRAM_SECONDS = REGISTRY.histogram(
+    'webhook_to_telegram_seconds', 'Time from receiving a webhook to its messages being sent', ('feed',))
+
+
+async def _handle(reader: 'asyncio.StreamReader', writer: 'asyncio.StreamWriter', registry: Registry):
+    try:
+        request_line = await reader.readline()
+        # Drain the headers; the request has no body
+        while (await reader.readline()) not in (b'\r\n', b'\n', b''):
+            pass
+        parts = request_line.decode('latin-1').split()
+        if len(parts) >= 2 and parts[0] == 'GET' and parts[1].split('?')[0] == '/metrics':
+            status, body = '200 OK', registry.render().encode('utf-8')
+        else:
+            status, body = '404 Not Found', b'Not Found\n'
+        writer.write(
+            f'HTTP/1.1 {status}\r\n'
+            f'Content-Type: text/plain; version=0.0.4; charset=utf-8\r\n'
+            f'Content-Length: {len(body)}\r\n'
+            f'Connection: close\r\n\r\n'.encode('latin-1') + body
+        )
+        await writer.drain()
+    except ConnectionError:
+        pass
+    finally:
+        writer.close()
+
+
+async def start_metrics_server(host: str, port: int, registry: Registry = REGISTRY) -> 'asyncio.AbstractServer':
+    import asyncio
+
+    server = await asyncio.start_server(lambda r, w: _handle(r, w, registry), host, port)
+    logger.info(f"Serving metrics on http://{host}:{port}/metrics")
+    return server
@@ -1,40 +1,60 @@
 #!/usr/bin/env python3
 """
 Simplified monitor script for GitHub Actions
+
+The runner starts on every schedule tick and most ticks find the feed
+unchanged, so start-up is kept short: the feed is fetched with urllib,
+and requests and the feed parser are only imported once there is
+something to read or send.
 """
 import os
 import sys
-import feedparser
-import requests
-import sqlite3
 from datetime import datetime
 import re
+from feed_fetch import fetch_feed, UNCHANGED
+from state_file import StateFile, open_state
+from status_parser import classify_status
 
 # Configuration from environment
 TELEGRAM_BOT_TOKEN = os.getenv('TELEGRAM_BOT_TOKEN')
 TELEGRAM_CHANNEL_ID = os.getenv('TELEGRAM_CHANNEL_ID')
+TELEGRAM_API_URL = os.getenv('TELEGRAM_API_URL', 'https://api.telegram.org/bot')
 RSS_FEED_URL = os.getenv('RSS_FEED_URL', 'https://status.lovable.dev/feed.rss')
 DATABASE_PATH = 'lovable_status.db'
+# A path ending in .state keeps the state in a text file (see state_file.py);
+# it is seeded from DATABASE_PATH on the first run
+STATE_PATH = os.getenv('STATE_PATH', DATABASE_PATH)
+FEED_KNOWN_RUN = int(os.getenv('FEED_KNOWN_RUN', '5'))
+
+# Single connection (or state file) for the whole run; the file is committed
+# back to the repo by the workflow, so a database is opened without WAL
+db = None
+
+# Telegram requests reuse pooled keep-alive connections; created on the
+# first send
+session = None
+
+def get_session():
+    """Shared requests session, importing requests on first use"""
+    global session
+    if session is None:
+        import requests
+        session = requests.Session()
+    return session
 
 def init_database():
-    """Initialize SQLite database"""
-    conn = sqlite3.connect(DATABASE_PATH)
-    cursor = conn.cursor()
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS incidents (
-            guid TEXT PRIMARY KEY,
-            title TEXT NOT NULL,
-            status TEXT,
-            description TEXT,
-            link TEXT,
-            posted_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            telegram_message_id INTEGER,
-            last_updated TIMESTAMP
-        )
-    ''')
-    conn.commit()
-    conn.close()
-    print("Database initialized")
+    """Open the state file or SQLite database"""
+    global db
+    migrate = not os.path.exists(STATE_PATH) and STATE_PATH != DATABASE_PATH and os.path.exists(DATABASE_PATH)
+    db = open_state(STATE_PATH, wal=False, default_chat_id=TELEGRAM_CHANNEL_ID)
+    if migrate and isinstance(db, StateFile):
+        legacy = open_state(DATABASE_PATH, wal=False, default_chat_id=TELEGRAM_CHANNEL_ID)
+        try:
+            db.import_state(*legacy.export_state())
+        finally:
+            legacy.close()
+        print(f"Imported state from {DATABASE_PATH}")
+    print(f"State loaded from {STATE_PATH}")
 
 def clean_html(html_text):
     """Remove HTML tags and clean text"""
@@ -46,22 +66,13 @@ def clean_html(html_text):
     text = re.sub(r'^Status:\s*(Resolved|Identified|Monitoring|Investigating)\s*', '', text, flags=re.IGNORECASE)
     return text.strip()
 
-def extract_status(text):
-    """Extract status from text"""
-    text_lower = text.lower()
-    if 'resolved' in text_lower:
-        return 'Resolved'
-    elif 'identified' in text_lower:
-        return 'Identified'
-    elif 'monitoring' in text_lower:
-        return 'Monitoring'
-    elif 'investigating' in text_lower:
-        return 'Investigating'
-    return 'Unknown'
+def extract_status(description, title=''):
+    """Extract the status of the latest update"""
+    return classify_status(description, title).status
 
 def send_telegram_message(text):
     """Send message to Telegram"""
-    url = f"https://api.telegram.org/bot{TELEGRAM_BOT_TOKEN}/sendMessage"
+    url = f"{TELEGRAM_API_URL}{TELEGRAM_BOT_TOKEN}/sendMessage"
     data = {
         'chat_id': TELEGRAM_CHANNEL_ID,
         'text': text,
@@ -70,7 +81,7 @@ def send_telegram_message(text):
     }
     
     try:
-        response = requests.post(url, json=data)
+        response = get_session().post(url, json=data)
         if response.status_code == 200:
             result = response.json()
             print(f"Message sent successfully: {result['result']['message_id']}")
@@ -109,34 +120,15 @@ def format_message(incident):
     
     return message
 
-def check_incident_exists(guid):
-    """Check if incident already exists in database"""
-    conn = sqlite3.connect(DATABASE_PATH)
-    cursor = conn.cursor()
-    cursor.execute('SELECT guid FROM incidents WHERE guid = ?', (guid,))
-    exists = cursor.fetchone() is not None
-    conn.close()
-    return exists
-
-def save_incident(incident):
-    """Save incident to database"""
-    conn = sqlite3.connect(DATABASE_PATH)
-    cursor = conn.cursor()
-    cursor.execute('''
-        INSERT OR REPLACE INTO incidents 
-        (guid, title, status, description, link, telegram_message_id, last_updated)
-        VALUES (?, ?, ?, ?, ?, ?, ?)
-    ''', (
-        incident['guid'],
-        incident['title'],
-        incident['status'],
-        incident.get('description', ''),
-        incident.get('link', ''),
-        incident.get('telegram_message_id'),
-        datetime.now()
-    ))
-    conn.commit()
-    conn.close()
+def load_posted_incidents(guids):
+    """Load the already posted incidents for all feed GUIDs in one query"""
+    return db.get_incidents(guids)
+
+def save_incidents(incidents):
+    """Save posted incidents to database in one transaction"""
+    db.save_incidents([
+        dict(incident, last_updated=datetime.now()) for incident in incidents
+    ])
 
 def send_test_message():
     """Send a test message to verify bot is working"""
@@ -164,36 +156,58 @@ def main():
     print(f"Feed URL: {RSS_FEED_URL}")
     
     # Send test message on first run or if requested
-    if os.getenv('SEND_TEST_MESSAGE', 'false').lower() == 'true' or not os.path.exists(DATABASE_PATH):
+    if os.getenv('SEND_TEST_MESSAGE', 'false').lower() == 'true' or not (
+            os.path.exists(STATE_PATH) or os.path.exists(DATABASE_PATH)):
         send_test_message()
     
     # Initialize database
     init_database()
     
-    # Parse RSS feed
+    # Fetch RSS feed, skipping everything below if it has not changed
     print(f"Fetching RSS feed from {RSS_FEED_URL}")
-    feed = feedparser.parse(RSS_FEED_URL)
+    try:
+        result = fetch_feed(RSS_FEED_URL, db.get_feed_validators(RSS_FEED_URL))
+    except Exception as e:
+        # Network errors and 5xx responses are retried on the next tick
+        print(f"Error fetching feed: {e}")
+        return
     
-    if feed.bozo:
-        print(f"Error parsing feed: {feed.bozo_exception}")
+    if not result.changed:
+        if result.status == UNCHANGED:
+            db.save_feed_validators(RSS_FEED_URL, result.validators)
+        print(f"Feed not changed ({result.status}), skipped processing")
+        print("Monitor run completed successfully")
         return
     
-    print(f"Found {len(feed.entries)} entries in feed")
+    from feed_parser import read_feed
+    
+    # Past a run of entries already stored unchanged, read only entries dated after them
+    entry_hashes = db.get_entry_hashes()
+    try:
+        snapshot = read_feed(
+            result.content,
+            is_known=lambda guid, entry_hash: entry_hashes.get(guid) == entry_hash,
+            stop_after=FEED_KNOWN_RUN
+        )
+    except ValueError as e:
+        print(e)
+        return
+    
+    print(f"Read {len(snapshot.incidents)} entries from feed"
+          + ("" if snapshot.complete else " (skipped known entries)"))
     
     # Track what we process
     active_incidents = 0
     new_incidents = 0
+    failed_incidents = 0
+    posted = []
+    failed = set()
+    
+    posted_before = load_posted_incidents([incident['guid'] for incident in snapshot.incidents])
     
     # Process entries (newest first)
-    for entry in feed.entries:
-        incident = {
-            'guid': entry.get('guid', entry.get('id', '')),
-            'title': entry.get('title', 'No title'),
-            'description': entry.get('summary', entry.get('description', '')),
-            'link': entry.get('link', ''),
-        }
-        
-        incident['status'] = extract_status(incident['description'] + ' ' + incident['title'])
+    for incident in snapshot.incidents:
+        incident['status'] = extract_status(incident['description'], incident['title'])
         
         print(f"\nProcessing: {incident['title']} - Status: {incident['status']}")
         
@@ -204,8 +218,10 @@ def main():
         
         active_incidents += 1
         
-        # Check if already posted
-        if check_incident_exists(incident['guid']):
+        # Check if already posted; entries that were only read are stored
+        # without a message
+        stored = posted_before.get(incident['guid'])
+        if stored and (stored.get('messages') or stored.get('telegram_message_id')):
             print(f"  → Already posted")
             continue
         
@@ -216,16 +232,36 @@ def main():
         
         if message_id:
             incident['telegram_message_id'] = message_id
-            save_incident(incident)
+            incident['messages'] = {TELEGRAM_CHANNEL_ID: message_id}
+            posted.append(incident)
             new_incidents += 1
             print(f"  → Success! Message ID: {message_id}")
         else:
+            failed_incidents += 1
+            failed.add(incident['guid'])
             print(f"  → Failed to send message")
     
+    # Every other entry read is stored with its hash, so the next run stops
+    # at a run of known entries; one that failed to post stays unknown
+    posted_guids = {incident['guid'] for incident in posted}
+    seen = [
+        incident for incident in snapshot.incidents
+        if incident['guid'] not in failed and incident['guid'] not in posted_guids
+        and entry_hashes.get(incident['guid']) != incident['entry_hash']
+    ]
+    
+    # Keep the feed marked as changed until every new incident was posted
+    with db.transaction():
+        save_incidents(posted)
+        db.save_incident_states(seen)
+        if not failed_incidents:
+            db.save_feed_validators(RSS_FEED_URL, result.validators)
+    
     print(f"\nSummary:")
-    print(f"- Total entries: {len(feed.entries)}")
+    print(f"- Entries read: {len(snapshot.incidents)}")
     print(f"- Active incidents: {active_incidents}")
     print(f"- New incidents posted: {new_incidents}")
+    print(f"- Failed to post: {failed_incidents}")
     print("Monitor run completed successfully")
 
 if __name__ == "__main__":
@@ -234,4 +270,10 @@ if __name__ == "__main__":
         print("ERROR: Missing TELEGRAM_BOT_TOKEN or TELEGRAM_CHANNEL_ID")
         sys.exit(1)
     
-    main()
\ No newline at end of file
+    try:
+        main()
+    finally:
+        if session:
+            session.close()
+        if db:
+            db.close()
\ No newline at end of file
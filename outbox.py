@@ -0,0 +1,182 @@
+"""
+Durable outbox for Telegram deliveries.
+
+Polls and webhook pushes do not talk to Telegram themselves. They write
+the rendered message for every chat that needs it into the ``outbox``
+table, in the same transaction that stores the incident, and
+``OutboxWorker`` drains the table in the background. A delivery leaves
+the outbox only together with the message id it produced; a failed one is
+retried with exponential backoff, and a crash at any point leaves the row
+to be picked up again on the next start.
+
+Every row has an idempotency key (feed, GUID, chat and a hash of the
+text), so the same delivery queued twice, e.g. by a webhook and then the
+reconciliation poll, is stored once. A newer text for the same message
+replaces the pending one, so only the latest state of an incident is sent.
+Edits can be held back for a debounce window (``delay``); changes that
+arrive inside it are merged into one edit at the end of the window.
+Whether a delivery sends a new message or edits the existing copy is
+decided when it goes out.
+"""
+import asyncio
+import logging
+import random
+import time
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from caching import content_hash
+from metrics import OUTBOX_DELIVERY_SECONDS, WEBHOOK_TO_TELEGRAM_SECONDS
+from telegram_dispatch import PermanentDeliveryError
+
+logger = logging.getLogger(__name__)
+
+
+def make_delivery(feed: str, guid: str, chat_id: str, text: str, source: str = 'poll',
+                  created_at: Optional[float] = None, delay: float = 0) -> Dict:
+    """Outbox row for ``DatabaseManager.enqueue_deliveries``, due ``delay``
+    seconds after ``created_at``."""
+    created_at = created_at or time.time()
+    return {
+        'idempotency_key': content_hash(feed, guid, str(chat_id), text),
+        'feed': feed,
+        'guid': guid,
+        'chat_id': str(chat_id),
+        'text': text,
+        'source': source,
+        'not_before': created_at + delay,
+        'created_at': created_at
+    }
+
+
+class OutboxWorker:
+    def __init__(self, db, send_queue, batch_size: int = 100, retry_seconds: float = 5,
+                 max_retry_seconds: float = 600, max_attempts: int = 10, state=None):
+        self.db = db
+        self.send_queue = send_queue
+        # HotState kept current with every delivered message, if any
+        self.state = state
+        self.batch_size = batch_size
+        self.retry_seconds = retry_seconds
+        self.max_retry_seconds = max_retry_seconds
+        self.max_attempts = max_attempts
+        self._wake = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+        self.delivered = 0
+        self.retried = 0
+        self.dead = 0
+        self.pending = 0
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    def notify(self):
+        """Wake the worker after new deliveries were committed."""
+        self._wake.set()
+
+    async def close(self):
+        """Stop the worker. Undelivered rows stay in the outbox."""
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def drain(self):
+        """Deliver everything that is due now, e.g. for a one-off run."""
+        while await self.deliver_due():
+            pass
+
+    def _backoff(self, attempts: int) -> float:
+        delay = min(self.max_retry_seconds, self.retry_seconds * 2 ** (attempts - 1))
+        # Spread retries of a failed batch so they do not all return at once
+        return delay * random.uniform(0.8, 1.2)
+
+    async def deliver_due(self) -> int:
+        """Send one batch of due deliveries; returns how many were attempted."""
+        rows = await self.db.run(self.db.get_due_deliveries, time.time(), self.batch_size)
+        if not rows:
+            return 0
+
+        # The send queue paces the requests and keeps edits of a message in
+        # order. Outcomes are recorded as they come in, so a throttled chat
+        # does not hold back, and a crash does not lose, the ones already sent.
+        sends = {
+            asyncio.ensure_future(self.send_queue.send(row['chat_id'], row['text'], row['message_id'])): row
+            for row in rows
+        }
+        pending = set(sends)
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                await self._record([(sends[task], task.exception() or task.result()) for task in done])
+        finally:
+            for task in pending:
+                task.cancel()
+        return len(rows)
+
+    async def _record(self, outcomes: List[Tuple[Dict, object]]):
+        """Store the outcomes of finished deliveries: a message id, or a
+        falsy value or exception for a failed one."""
+        now = time.time()
+        delivered, failed = [], []
+        for row, outcome in outcomes:
+            if outcome and not isinstance(outcome, Exception):
+                row.update(message_id=outcome, content_hash=content_hash(row['text']), sent_at=datetime.now())
+                delivered.append(row)
+                OUTBOX_DELIVERY_SECONDS.observe(now - row['created_at'], source=row['source'])
+                if row['source'] == 'webhook':
+                    WEBHOOK_TO_TELEGRAM_SECONDS.observe(now - row['created_at'], feed=row['feed'])
+                continue
+            attempts = row['attempts'] + 1
+            # A bad request or a chat that blocked the bot fails the same way every time
+            dead = attempts >= self.max_attempts or isinstance(outcome, PermanentDeliveryError)
+            row.update(
+                attempts=attempts,
+                not_before=now + self._backoff(attempts),
+                error=str(outcome) if isinstance(outcome, Exception) else 'delivery failed',
+                dead=dead
+            )
+            failed.append(row)
+            if dead:
+                logger.error(
+                    f"[{row['feed']}] Giving up on delivery to {row['chat_id']} after {attempts} attempts: {row['error']}"
+                )
+            else:
+                logger.warning(
+                    f"[{row['feed']}] Delivery to {row['chat_id']} failed, retrying in "
+                    f"{row['not_before'] - now:.0f}s (attempt {attempts})"
+                )
+
+        self.pending = await self.db.run(self.db.record_deliveries, delivered, failed)
+        if self.state is not None:
+            for row in delivered:
+                self.state.record_delivery(row['feed'], row['guid'], row['chat_id'], row['message_id'], row['content_hash'])
+        self.delivered += len(delivered)
+        self.retried += sum(1 for row in failed if not row['dead'])
+        self.dead += sum(1 for row in failed if row['dead'])
+
+    async def _run(self):
+        while True:
+            self._wake.clear()
+            try:
+                if await self.deliver_due():
+                    continue
+                next_at = await self.db.run(self.db.next_delivery_at)
+            except Exception as e:
+                logger.error(f"Error draining the outbox: {e}", exc_info=True)
+                next_at = time.time() + self.retry_seconds
+            timeout = None if next_at is None else max(0.0, next_at - time.time())
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+
+    def stats(self) -> Dict:
+        return {
+            'pending': self.pending,
+            'delivered': self.delivered,
+            'retried': self.retried,
+            'dead': self.dead
+        }
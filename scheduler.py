@@ -0,0 +1,49 @@
+"""
+Poll interval selection for feed monitors.
+
+In ``fixed`` mode every feed is polled at its configured interval. In
+``adaptive`` mode a feed is polled every ``active_seconds`` while it has
+an unresolved incident and backs off exponentially from its interval up
+to ``max_seconds`` while everything is resolved.
+"""
+import random
+
+FIXED = 'fixed'
+ADAPTIVE = 'adaptive'
+
+
+class PollScheduler:
+    def __init__(self, base_seconds: float, mode: str = FIXED, active_seconds: float = 60,
+                 max_seconds: float = 1800, backoff: float = 2.0, jitter: float = 0.1):
+        if mode not in (FIXED, ADAPTIVE):
+            raise ValueError(f"Unknown poll mode: {mode}")
+        self.base_seconds = base_seconds
+        self.mode = mode
+        self.active_seconds = min(active_seconds, base_seconds)
+        self.max_seconds = max(max_seconds, base_seconds)
+        self.backoff = backoff
+        self.jitter = jitter
+        self.quiet_polls = 0
+        self.current_interval = base_seconds
+
+    def next_delay(self, active: bool, elapsed: float) -> float:
+        """Seconds to sleep after a poll that took ``elapsed`` seconds.
+
+        The poll's own duration is subtracted so polls start on a steady
+        cadence instead of drifting by the fetch time every cycle.
+        """
+        if self.mode == FIXED:
+            interval = self.base_seconds
+        elif active:
+            self.quiet_polls = 0
+            interval = self.active_seconds
+        else:
+            interval = min(self.max_seconds, self.base_seconds * self.backoff ** self.quiet_polls)
+            self.quiet_polls += 1
+
+        if self.jitter:
+            # Spread polls of feeds that share an interval
+            interval *= 1 + random.uniform(-self.jitter, self.jitter)
+
+        self.current_interval = interval
+        return max(0.0, interval - elapsed)
@@ -0,0 +1,241 @@
+"""
+Line-oriented state file for the GitHub Actions monitor.
+
+The workflow commits the runner's state back to the repository after every
+run. A SQLite file rewrites binary pages on each change, so every commit
+adds a new copy of the database to the history. ``StateFile`` keeps the
+same state (feed validators and the incidents that were read or posted)
+as one JSON object per line instead:
+
+* changes are appended, so a run adds a few lines and its commit is a
+  small text diff; the last line for a key wins;
+* once superseded lines outnumber the live ones the file is compacted:
+  rewritten with one line per key, sorted, so it diffs cleanly again;
+* loading is one sequential read of the file into dicts.
+
+It offers the part of ``DatabaseManager``'s API the runner uses, and
+``open_state`` picks the backend from the file name, so the runner can
+use either. ``import_state`` seeds a new state file, e.g. from
+``DatabaseManager.export_state``.
+"""
+import json
+import logging
+import os
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from storage import DEFAULT_FEED, DatabaseManager
+
+logger = logging.getLogger(__name__)
+
+HEADER = '# lovable-status-bot state v1'
+
+# Paths ending in this are state files, anything else is a SQLite database
+STATE_SUFFIX = '.state'
+
+# Incident fields kept in the state file; descriptions and links are only
+# needed to render a message, not to tell what was already posted
+INCIDENT_FIELDS = (
+    'title', 'status', 'entry_hash', 'content_hash', 'telegram_message_id', 'messages', 'last_updated'
+)
+
+
+def _key(record: Dict) -> Tuple:
+    if record['type'] == 'feed':
+        return ('feed', record['url'])
+    return ('incident', record['feed'], record['guid'])
+
+
+def _dump(record: Dict) -> str:
+    # Sorted keys make equal records serialize identically
+    return json.dumps(record, sort_keys=True, ensure_ascii=False, separators=(',', ':'), default=str)
+
+
+class StateFile:
+    def __init__(self, path: str, compact_after: int = 64):
+        self.path = path
+        # Compact once more than this many lines (and more lines than there
+        # are live records) are superseded
+        self.compact_after = compact_after
+        self.records: Dict[Tuple, Dict] = {}
+        self.lines = 0
+        self._pending: List[Dict] = []
+        self._transaction_depth = 0
+        # Set when the file ends in a partial line the next append must not extend
+        self._unterminated = False
+        self._load()
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, encoding='utf-8') as f:
+            for number, line in enumerate(f, start=1):
+                self._unterminated = not line.endswith('\n')
+                line = line.strip()
+                if not line or line.startswith('#'):
+                    continue
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    # A run killed while appending leaves a partial last line
+                    logger.warning(f"Skipping unreadable line {number} of {self.path}")
+                    continue
+                self.records[_key(record)] = record
+                self.lines += 1
+        logger.info(f"Loaded {len(self.records)} records from {self.path}")
+
+    @property
+    def superseded(self) -> int:
+        return self.lines - len(self.records)
+
+    @contextmanager
+    def transaction(self) -> Iterator['StateFile']:
+        """Append the writes of the block together. Nested uses join the outer one."""
+        self._transaction_depth += 1
+        try:
+            yield self
+        except BaseException:
+            if self._transaction_depth == 1:
+                self._pending = []
+            raise
+        else:
+            if self._transaction_depth == 1:
+                pending, self._pending = self._pending, []
+                self._append(pending)
+        finally:
+            self._transaction_depth -= 1
+
+    def _write(self, records: List[Dict]):
+        """Queue records that differ from the stored ones."""
+        changed = [record for record in records if self.records.get(_key(record)) != record]
+        if not changed:
+            return
+        self._pending.extend(changed)
+        if not self._transaction_depth:
+            pending, self._pending = self._pending, []
+            self._append(pending)
+
+    def _append(self, records: List[Dict]):
+        if not records:
+            return
+        new_file = not os.path.exists(self.path)
+        with open(self.path, 'a', encoding='utf-8') as f:
+            if new_file:
+                f.write(HEADER + '\n')
+            elif self._unterminated:
+                f.write('\n')
+            f.writelines(_dump(record) + '\n' for record in records)
+            f.flush()
+            os.fsync(f.fileno())
+        self._unterminated = False
+        for record in records:
+            self.records[_key(record)] = record
+        self.lines += len(records)
+
+    def compact(self):
+        """Rewrite the file with one line per record, sorted by key."""
+        temp_path = self.path + '.tmp'
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            f.write(HEADER + '\n')
+            f.writelines(_dump(self.records[key]) + '\n' for key in sorted(self.records))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, self.path)
+        logger.info(f"Compacted {self.path}: dropped {self.superseded} superseded lines")
+        self.lines = len(self.records)
+        self._unterminated = False
+
+    def close(self):
+        if self.superseded > max(self.compact_after, len(self.records)):
+            self.compact()
+
+    def import_state(self, validators: Dict[str, Dict], incidents: List[Dict]):
+        """Add feed validators by URL and incidents, e.g. from
+        ``DatabaseManager.export_state``."""
+        with self.transaction():
+            for feed_url, feed_validators in validators.items():
+                self.save_feed_validators(feed_url, feed_validators)
+            self.save_incidents(incidents)
+
+    def get_feed_validators(self, feed_url: str) -> Optional[Dict]:
+        record = self.records.get(('feed', feed_url))
+        if record:
+            return {
+                'etag': record.get('etag'),
+                'last_modified': record.get('last_modified'),
+                'content_hash': record.get('content_hash')
+            }
+        return None
+
+    def save_feed_validators(self, feed_url: str, validators: Dict):
+        """Remember the validators of a processed response; unchanged ones add no line."""
+        self._write([{
+            'type': 'feed',
+            'url': feed_url,
+            'etag': validators.get('etag'),
+            'last_modified': validators.get('last_modified'),
+            'content_hash': validators.get('content_hash')
+        }])
+
+    def get_incident(self, guid: str, feed: str = DEFAULT_FEED) -> Optional[Dict]:
+        record = self.records.get(('incident', feed, guid))
+        if record is None:
+            return None
+        incident = {name: record.get(name) for name in INCIDENT_FIELDS}
+        incident.update(feed=feed, guid=guid, messages=dict(record.get('messages') or {}))
+        return incident
+
+    def get_incidents(self, guids: List[str], feed: str = DEFAULT_FEED) -> Dict[str, Dict]:
+        """The stored incidents among ``guids``, by GUID."""
+        incidents = {}
+        for guid in guids:
+            incident = self.get_incident(guid, feed)
+            if incident is not None:
+                incidents[guid] = incident
+        return incidents
+
+    def get_entry_hashes(self, feed: str = DEFAULT_FEED) -> Dict[str, str]:
+        """Entry hash of every stored incident of a feed, by GUID."""
+        return {
+            key[2]: record['entry_hash'] for key, record in self.records.items()
+            if key[0] == 'incident' and key[1] == feed and record.get('entry_hash')
+        }
+
+    def save_incident(self, incident: Dict):
+        self.save_incidents([incident])
+
+    def save_incidents(self, incidents: List[Dict]):
+        """Upsert incidents together with their per-chat message ids."""
+        self._write([
+            dict(
+                {name: incident.get(name) for name in INCIDENT_FIELDS},
+                type='incident',
+                feed=incident.get('feed', DEFAULT_FEED),
+                guid=incident['guid'],
+                messages={str(chat_id): message_id for chat_id, message_id in (incident.get('messages') or {}).items()},
+                last_updated=str(incident['last_updated']) if incident.get('last_updated') else None
+            )
+            for incident in incidents
+        ])
+
+    def save_incident_states(self, incidents: List[Dict]):
+        """Upsert what incidents look like, leaving their messages alone."""
+        records = []
+        for incident in incidents:
+            key = ('incident', incident.get('feed', DEFAULT_FEED), incident['guid'])
+            record = dict(self.records.get(key) or {'type': 'incident', 'feed': key[1], 'guid': key[2]})
+            record.update(
+                title=incident['title'],
+                status=incident.get('status'),
+                entry_hash=incident.get('entry_hash'),
+                last_updated=str(incident['last_updated']) if incident.get('last_updated') else None
+            )
+            records.append(record)
+        self._write(records)
+
+
+def open_state(path: str, wal: bool = True, default_chat_id: Optional[str] = None):
+    """A ``StateFile`` for paths ending in ``.state``, otherwise a ``DatabaseManager``."""
+    if path.endswith(STATE_SUFFIX):
+        return StateFile(path)
+    return DatabaseManager(path, wal=wal, default_chat_id=default_chat_id)
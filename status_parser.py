@@ -0,0 +1,149 @@
+"""
+Current status of an incident from its feed entry.
+
+Statuspage descriptions list an incident's updates newest first, either as
+``<b>Status: Identified</b>`` markers or, in incident history feeds, as
+blocks like::
+
+    <p><small>Jul <var data-var='date'>18</var>, <var data-var='time'>13:27</var> UTC</small><br>
+    <strong>Resolved</strong> - This incident has been resolved.</p>
+
+``classify_status`` scans the description with one compiled pattern that
+matches update timestamps and every status marker, and takes the status
+of the latest update, so an old "Resolved" further down the history no
+longer wins over a newer "Investigating". As updates are newest first the
+scan ends at the first marker that carries a status; the full list of
+updates with their timestamps is read from the same pattern on first use.
+Only a description without any markers falls back to status keywords
+anywhere in the description and title, matched in one pass, with the
+precedence the bot has always used. Results are cached, as descriptions
+repeat from poll to poll.
+"""
+import re
+from datetime import datetime, timedelta, timezone
+from functools import lru_cache
+from typing import Optional, Tuple
+
+# Keyword fallback precedence: a description that mentions resolution
+# without any markers is taken as resolved
+STATUSES = ('Resolved', 'Identified', 'Monitoring', 'Investigating')
+
+_CANONICAL = {status.lower(): status for status in STATUSES}
+
+# Update blocks that do not change the status
+_STATUSLESS_BLOCKS = 'Update|Postmortem'
+
+_KEYWORDS = '|'.join(STATUSES)
+
+# Tags are matched case-sensitively, which lets the engine skip ahead much
+# faster than a fully case-insensitive pattern; status names are not
+_MARKERS = re.compile(
+    r'<small>(?P<time>[^<]*(?:<(?!/small>)[^<]*)*)</small>'
+    rf'|<strong>\s*(?P<block>(?i:{_KEYWORDS}|{_STATUSLESS_BLOCKS}))\s*</strong>'
+    rf'|Status:\s*(?P<marker>(?i:{_KEYWORDS}))\b'
+)
+_TAG = re.compile(r'<[^>]+>')
+_WORDS = re.compile(rf'\b(?:{_KEYWORDS})\b', re.IGNORECASE)
+
+# Timestamps are shown without a year unless the update is from another year
+_TIMESTAMP_FORMATS = ('%b %d, %Y - %H:%M', '%b %d, %Y %H:%M', '%b %d, %H:%M')
+
+
+def _parse_timestamp(text: str, published: Optional[datetime]) -> Optional[datetime]:
+    text = text.replace('UTC', '').strip()
+    reference = published or datetime.now(timezone.utc)
+    for fmt in _TIMESTAMP_FORMATS:
+        try:
+            parsed = datetime.strptime(text, fmt)
+        except ValueError:
+            continue
+        if '%Y' in fmt:
+            return parsed.replace(tzinfo=timezone.utc)
+        parsed = parsed.replace(year=reference.year, tzinfo=timezone.utc)
+        # A December update of an entry published in January
+        if parsed > reference + timedelta(days=1):
+            parsed = parsed.replace(year=reference.year - 1)
+        return parsed
+    return None
+
+
+class StatusUpdate:
+    """One update of an incident; ``status`` is None for plain updates."""
+
+    __slots__ = ('status', 'timestamp', '_published', '_at')
+
+    def __init__(self, status: Optional[str], timestamp: Optional[str] = None,
+                 published: Optional[datetime] = None):
+        self.status = status
+        # As shown in the feed, e.g. "Jul 18, 13:27 UTC"
+        self.timestamp = timestamp
+        self._published = published
+        self._at = None
+
+    @property
+    def at(self) -> Optional[datetime]:
+        """The timestamp as an aware UTC datetime, parsed on first use."""
+        if self._at is None and self.timestamp:
+            self._at = _parse_timestamp(self.timestamp, self._published)
+        return self._at
+
+    def __repr__(self):
+        return f"StatusUpdate({self.status!r}, {self.timestamp!r})"
+
+
+class StatusClassification:
+    """An incident's current status; its updates are read on first use."""
+
+    __slots__ = ('status', '_description', '_published', '_updates')
+
+    def __init__(self, status: str, description: str = '', published: Optional[datetime] = None):
+        self.status = status
+        self._description = description
+        self._published = published
+        self._updates = None
+
+    @property
+    def updates(self) -> Tuple[StatusUpdate, ...]:
+        """Every update in the description, newest first."""
+        if self._updates is None:
+            updates = []
+            timestamp = None
+            for match in _MARKERS.finditer(self._description):
+                kind = match.lastgroup
+                if kind == 'time':
+                    timestamp = ' '.join(_TAG.sub('', match.group(kind)).split())
+                else:
+                    updates.append(StatusUpdate(_CANONICAL.get(match.group(kind).lower()), timestamp, self._published))
+                    timestamp = None
+            self._updates = tuple(updates)
+        return self._updates
+
+    @property
+    def update_count(self) -> int:
+        return len(self.updates)
+
+    def __repr__(self):
+        return f"StatusClassification({self.status!r}, {self.update_count} updates)"
+
+
+@lru_cache(maxsize=1024)
+def classify_status(description: str, title: str = '',
+                    published: Optional[datetime] = None) -> StatusClassification:
+    """Classify an entry by the latest status marker in its description.
+
+    Updates are listed newest first, so the scan stops at the first marker
+    that carries a status. ``published`` is the entry's date, used to place
+    update timestamps that are shown without a year.
+    """
+    description = description or ''
+    for match in _MARKERS.finditer(description):
+        kind = match.lastgroup
+        if kind != 'time':
+            status = _CANONICAL.get(match.group(kind).lower())
+            if status:
+                return StatusClassification(status, description, published)
+
+    # No markers: every keyword in the description and title, in one pass
+    keywords = {word.lower() for word in _WORDS.findall(f'{description} {title or ""}')}
+    status = next((status for status in STATUSES if status.lower() in keywords), 'Unknown')
+    return StatusClassification(status, description, published)
@@ -0,0 +1,912 @@
+"""
+SQLite storage shared by the bot and the GitHub Actions monitor.
+
+A single long-lived connection is kept per database. Statements are
+module-level constants so sqlite3's per-connection statement cache
+reuses the prepared statements across calls.
+"""
+import json
+import logging
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import Optional, Dict, List, Iterator, Set, Tuple
+
+from metrics import DB_QUERY_SECONDS
+from subscriptions import Subscription
+
+logger = logging.getLogger(__name__)
+
+# Feed name used for databases created before multi-feed support and by
+# the single-feed runners
+DEFAULT_FEED = 'default'
+
+PRAGMAS = (
+    'PRAGMA synchronous=NORMAL',
+    'PRAGMA cache_size=-8192',      # 8 MiB page cache
+    'PRAGMA mmap_size=67108864',    # 64 MiB memory map
+    'PRAGMA temp_store=MEMORY',
+    'PRAGMA busy_timeout=5000',
+)
+
+SELECT_INCIDENT = '''
+    SELECT feed, guid, title, status, description, link, telegram_message_id, last_updated,
+           content_hash, sent_at, entry_hash
+    FROM incidents WHERE feed = ? AND guid = ?
+'''
+
+SELECT_MESSAGES = '''
+    SELECT guid, chat_id, message_id, content_hash
+    FROM incident_messages WHERE feed = ? AND guid = ?
+'''
+
+UPSERT_INCIDENT = '''
+    INSERT OR REPLACE INTO incidents
+    (feed, guid, title, status, description, link, telegram_message_id, last_updated,
+     content_hash, sent_at, entry_hash)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+'''
+
+# Stores what an incident looks like without touching the delivery columns,
+# which the outbox worker updates as messages go out
+UPSERT_INCIDENT_STATE = '''
+    INSERT INTO incidents (feed, guid, title, status, description, link, last_updated, entry_hash)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+    ON CONFLICT (feed, guid) DO UPDATE SET
+        title = excluded.title,
+        status = excluded.status,
+        description = excluded.description,
+        link = excluded.link,
+        last_updated = excluded.last_updated,
+        entry_hash = excluded.entry_hash
+'''
+
+UPSERT_MESSAGE = '''
+    INSERT OR REPLACE INTO incident_messages (feed, guid, chat_id, message_id, content_hash)
+    VALUES (?, ?, ?, ?, ?)
+'''
+
+SELECT_SNAPSHOT_INCIDENTS = '''
+    SELECT i.feed, i.guid, i.title, i.status, i.description, i.link, i.telegram_message_id, i.last_updated,
+           i.content_hash, i.sent_at, i.entry_hash
+    FROM feed_snapshot s JOIN incidents i ON i.feed = ? AND i.guid = s.guid
+'''
+
+SELECT_SNAPSHOT_MESSAGES = '''
+    SELECT m.guid, m.chat_id, m.message_id, m.content_hash
+    FROM feed_snapshot s JOIN incident_messages m ON m.feed = ? AND m.guid = s.guid
+'''
+
+# A stored incident by the end of its GUID or link; any other match comes
+# before the row kept under the given GUID
+SELECT_INCIDENT_BY_PATH = '''
+    SELECT guid FROM incidents
+    WHERE feed = ? AND (guid = ? OR guid LIKE ? ESCAPE '\\' OR link LIKE ? ESCAPE '\\')
+    ORDER BY guid = ?
+    LIMIT 1
+'''
+
+# Moves an incident to a new GUID in every table keyed by it
+RENAME_INCIDENT = tuple(
+    f'UPDATE {table} SET guid = ? WHERE feed = ? AND guid = ?'
+    for table in ('incidents', 'incident_messages', 'incident_updates', 'outbox')
+)
+
+# Appends a status transition unless it repeats the latest recorded status
+INSERT_UPDATE = '''
+    INSERT INTO incident_updates (feed, guid, status, title, observed_at)
+    SELECT ?, ?, ?, ?, ?
+    WHERE NOT EXISTS (
+        SELECT 1 FROM (
+            SELECT status FROM incident_updates
+            WHERE feed = ? AND guid = ?
+            ORDER BY observed_at DESC, id DESC LIMIT 1
+        ) WHERE status = ?
+    )
+'''
+
+SELECT_TIMELINE = '''
+    SELECT status, title, observed_at
+    FROM incident_updates
+    WHERE feed = ? AND guid = ?
+    ORDER BY observed_at, id
+'''
+
+# Milestones of one incident, aggregated over its (feed, guid) index range
+SELECT_MILESTONES = '''
+    SELECT MIN(observed_at),
+           MIN(CASE WHEN status = 'Identified' THEN observed_at END),
+           MIN(CASE WHEN status = 'Resolved' THEN observed_at END),
+           COUNT(*)
+    FROM incident_updates
+    WHERE feed = ? AND guid = ?
+'''
+
+# Incidents with an update inside a window, found through the observed_at,
+# (status, observed_at) or (feed, observed_at, guid) index and then aggregated per incident through
+# the (feed, guid, observed_at) index
+SELECT_WINDOW_MILESTONES = '''
+    WITH in_window AS (
+        SELECT DISTINCT feed, guid FROM incident_updates
+        WHERE {where}
+    )
+    SELECT w.feed, w.guid, i.title,
+           MIN(u.observed_at),
+           MIN(CASE WHEN u.status = 'Identified' THEN u.observed_at END),
+           MIN(CASE WHEN u.status = 'Resolved' THEN u.observed_at END),
+           COUNT(*)
+    FROM in_window w
+    JOIN incident_updates u ON u.feed = w.feed AND u.guid = w.guid
+    LEFT JOIN incidents i ON i.feed = w.feed AND i.guid = w.guid
+    GROUP BY w.feed, w.guid
+    ORDER BY MIN(u.observed_at)
+'''
+
+# Unresolved incidents and those updated since a cutoff, with the time of
+# their last recorded transition
+SELECT_HOT_INCIDENTS = '''
+    SELECT i.feed, i.guid, i.title, i.status, i.description, i.link, i.telegram_message_id, i.last_updated,
+           i.content_hash, i.sent_at, i.entry_hash,
+           (SELECT MAX(observed_at) FROM incident_updates u WHERE u.feed = i.feed AND u.guid = i.guid)
+    FROM incidents i
+    WHERE i.status != 'Resolved' OR EXISTS (
+        SELECT 1 FROM incident_updates u
+        WHERE u.feed = i.feed AND u.guid = i.guid AND u.observed_at >= ?
+    )
+'''
+
+SELECT_ALL_INCIDENTS = '''
+    SELECT feed, guid, title, status, description, link, telegram_message_id, last_updated,
+           content_hash, sent_at, entry_hash
+    FROM incidents ORDER BY feed, guid
+'''
+
+SELECT_ENTRY_HASHES = '''
+    SELECT guid, entry_hash FROM incidents
+    WHERE feed = ? AND entry_hash IS NOT NULL
+'''
+
+SELECT_SUBSCRIPTIONS = '''
+    SELECT feed, chat_id, components, min_severity, statuses
+    FROM subscriptions {where}
+    ORDER BY feed, chat_id
+'''
+
+UPSERT_SUBSCRIPTION = '''
+    INSERT OR REPLACE INTO subscriptions (feed, chat_id, components, min_severity, statuses, created_at)
+    VALUES (?, ?, ?, ?, ?, ?)
+'''
+
+# A new delivery is due no later than the pending one it replaces, so a
+# debounce window opens with the first change and is not pushed back by
+# later ones. The same text (same idempotency key) is kept as it is, and
+# nothing is queued for a message whose delivery was given up on.
+INSERT_DELIVERY = '''
+    INSERT OR IGNORE INTO outbox
+    (idempotency_key, feed, guid, chat_id, text, source, not_before, created_at)
+    SELECT ?, ?, ?, ?, ?, ?, MIN(?, COALESCE((
+        SELECT MIN(not_before) FROM outbox
+        WHERE feed = ? AND guid = ? AND chat_id = ? AND dead = 0
+    ), ?)), ?
+    WHERE NOT EXISTS (
+        SELECT 1 FROM outbox WHERE feed = ? AND guid = ? AND chat_id = ? AND dead
+    )
+'''
+
+# Pending rows with an older text for the same message are merged into the
+# new one
+DELETE_SUPERSEDED_DELIVERIES = '''
+    DELETE FROM outbox
+    WHERE feed = ? AND guid = ? AND chat_id = ? AND idempotency_key != ? AND dead = 0
+'''
+
+SELECT_QUEUED_MESSAGES = '''
+    SELECT DISTINCT guid, chat_id FROM outbox
+    WHERE feed = ?
+'''
+
+SELECT_DUE_DELIVERIES = '''
+    SELECT o.id, o.feed, o.guid, o.chat_id, o.text, o.source, o.attempts, o.created_at, m.message_id
+    FROM outbox o
+    LEFT JOIN incident_messages m ON m.feed = o.feed AND m.guid = o.guid AND m.chat_id = o.chat_id
+    WHERE o.dead = 0 AND o.not_before <= ?
+    ORDER BY o.not_before, o.id
+    LIMIT ?
+'''
+
+UPDATE_DELIVERED_INCIDENT = '''
+    UPDATE incidents
+    SET telegram_message_id = COALESCE(telegram_message_id, ?), content_hash = ?, sent_at = ?
+    WHERE feed = ? AND guid = ?
+'''
+
+UPDATE_FAILED_DELIVERY = '''
+    UPDATE outbox SET attempts = ?, not_before = ?, last_error = ?, dead = ?
+    WHERE id = ?
+'''
+
+SELECT_VALIDATORS = '''
+    SELECT etag, last_modified, content_hash
+    FROM feed_validators WHERE feed_url = ?
+'''
+
+UPSERT_VALIDATORS = '''
+    INSERT OR REPLACE INTO feed_validators
+    (feed_url, etag, last_modified, content_hash, updated_at)
+    VALUES (?, ?, ?, ?, ?)
+'''
+
+
+def _utc_timestamp(value: Optional[datetime] = None) -> str:
+    """Format a time like SQLite's CURRENT_TIMESTAMP so text ranges sort."""
+    value = value or datetime.now(timezone.utc)
+    if value.tzinfo:
+        value = value.astimezone(timezone.utc)
+    return value.strftime('%Y-%m-%d %H:%M:%S')
+
+
+def _parse_timestamp(value: Optional[str]) -> Optional[datetime]:
+    return datetime.fromisoformat(value) if value else None
+
+
+def _milestones(started_at: str, identified_at: Optional[str], resolved_at: Optional[str],
+                updates: int) -> Dict:
+    started = _parse_timestamp(started_at)
+    identified = _parse_timestamp(identified_at)
+    resolved = _parse_timestamp(resolved_at)
+    return {
+        'started_at': started,
+        'identified_at': identified,
+        'resolved_at': resolved,
+        'time_to_identify': identified - started if identified else None,
+        'time_to_resolve': resolved - started if resolved else None,
+        'updates': updates
+    }
+
+
+def _incident_from_row(row) -> Dict:
+    return {
+        'feed': row[0],
+        'guid': row[1],
+        'title': row[2],
+        'status': row[3],
+        'description': row[4],
+        'link': row[5],
+        'telegram_message_id': row[6],
+        'last_updated': row[7],
+        'content_hash': row[8],
+        'sent_at': row[9],
+        'entry_hash': row[10],
+        'messages': {},
+        # Hash of the text each chat's message shows, by chat
+        'sent_hashes': {}
+    }
+
+
+def _add_message(incident: Dict, chat_id: str, message_id: int, sent_hash: Optional[str]):
+    incident['messages'][chat_id] = message_id
+    if sent_hash:
+        incident['sent_hashes'][chat_id] = sent_hash
+
+
+def _migrate_feed_keys(conn: sqlite3.Connection, default_chat_id: Optional[str]):
+    """Key incidents by (feed, guid) and keep one message id per chat."""
+    conn.execute('''
+        CREATE TABLE incidents_by_feed (
+            feed TEXT NOT NULL,
+            guid TEXT NOT NULL,
+            title TEXT NOT NULL,
+            status TEXT,
+            description TEXT,
+            link TEXT,
+            posted_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            telegram_message_id INTEGER,
+            last_updated TIMESTAMP,
+            PRIMARY KEY (feed, guid)
+        )
+    ''')
+    conn.execute('''
+        INSERT INTO incidents_by_feed
+        (feed, guid, title, status, description, link, posted_at, telegram_message_id, last_updated)
+        SELECT ?, guid, title, status, description, link, posted_at, telegram_message_id, last_updated
+        FROM incidents
+    ''', (DEFAULT_FEED,))
+    conn.execute('DROP TABLE incidents')
+    conn.execute('ALTER TABLE incidents_by_feed RENAME TO incidents')
+    conn.execute('''
+        CREATE TABLE incident_messages (
+            feed TEXT NOT NULL,
+            guid TEXT NOT NULL,
+            chat_id TEXT NOT NULL,
+            message_id INTEGER NOT NULL,
+            PRIMARY KEY (feed, guid, chat_id)
+        )
+    ''')
+    if default_chat_id:
+        # Messages posted so far all went to the single configured channel
+        conn.execute('''
+            INSERT INTO incident_messages (feed, guid, chat_id, message_id)
+            SELECT feed, guid, ?, telegram_message_id
+            FROM incidents WHERE telegram_message_id IS NOT NULL
+        ''', (str(default_chat_id),))
+
+
+def _migrate_sent_content(conn: sqlite3.Connection, default_chat_id: Optional[str]):
+    """Record a hash of the rendered message and when it was last sent."""
+    conn.execute('ALTER TABLE incidents ADD COLUMN content_hash TEXT')
+    conn.execute('ALTER TABLE incidents ADD COLUMN sent_at TIMESTAMP')
+
+
+def _migrate_incident_updates(conn: sqlite3.Connection, default_chat_id: Optional[str]):
+    """Keep an append-only history of status transitions."""
+    conn.execute('''
+        CREATE TABLE incident_updates (
+            id INTEGER PRIMARY KEY,
+            feed TEXT NOT NULL,
+            guid TEXT NOT NULL,
+            status TEXT NOT NULL,
+            title TEXT,
+            observed_at TIMESTAMP NOT NULL
+        )
+    ''')
+    conn.execute('CREATE INDEX idx_updates_incident ON incident_updates (feed, guid, observed_at)')
+    conn.execute('CREATE INDEX idx_updates_status ON incident_updates (status, observed_at)')
+    conn.execute('CREATE INDEX idx_updates_observed ON incident_updates (observed_at)')
+    # The status each incident had when it was last saved is all that is
+    # known about the history so far
+    conn.execute('''
+        INSERT INTO incident_updates (feed, guid, status, title, observed_at)
+        SELECT feed, guid, COALESCE(status, 'Unknown'), title, COALESCE(posted_at, CURRENT_TIMESTAMP)
+        FROM incidents
+    ''')
+
+
+def _migrate_entry_hash(conn: sqlite3.Connection, default_chat_id: Optional[str]):
+    """Record a hash of the feed entry each incident was last saved from."""
+    conn.execute('ALTER TABLE incidents ADD COLUMN entry_hash TEXT')
+
+
+def _migrate_subscriptions(conn: sqlite3.Connection, default_chat_id: Optional[str]):
+    """Store per-chat subscriptions with component, severity and status filters."""
+    conn.execute('''
+        CREATE TABLE subscriptions (
+            feed TEXT NOT NULL,
+            chat_id TEXT NOT NULL,
+            components TEXT NOT NULL DEFAULT '[]',
+            min_severity TEXT,
+            statuses TEXT NOT NULL DEFAULT '[]',
+            created_at TIMESTAMP,
+            PRIMARY KEY (feed, chat_id)
+        )
+    ''')
+
+
+def _migrate_outbox(conn: sqlite3.Connection, default_chat_id: Optional[str]):
+    """Queue Telegram deliveries in a durable outbox."""
+    conn.execute('''
+        CREATE TABLE outbox (
+            id INTEGER PRIMARY KEY,
+            idempotency_key TEXT NOT NULL UNIQUE,
+            feed TEXT NOT NULL,
+            guid TEXT NOT NULL,
+            chat_id TEXT NOT NULL,
+            text TEXT NOT NULL,
+            source TEXT NOT NULL DEFAULT 'poll',
+            attempts INTEGER NOT NULL DEFAULT 0,
+            not_before REAL NOT NULL,
+            created_at REAL NOT NULL,
+            last_error TEXT,
+            dead INTEGER NOT NULL DEFAULT 0
+        )
+    ''')
+    conn.execute('CREATE INDEX idx_outbox_due ON outbox (dead, not_before)')
+    conn.execute('CREATE INDEX idx_outbox_message ON outbox (feed, guid, chat_id)')
+
+
+def _migrate_updates_feed_index(conn: sqlite3.Connection, default_chat_id: Optional[str]):
+    """Index incident_updates by (feed, observed_at) for per-feed windows."""
+    # Without it a window filtered by feed ranges over the feed's whole
+    # history through idx_updates_incident; guid makes it covering, so
+    # the planner prefers it
+    conn.execute('CREATE INDEX idx_updates_feed ON incident_updates (feed, observed_at, guid)')
+
+
+def _migrate_message_hashes(conn: sqlite3.Connection, default_chat_id: Optional[str]):
+    """Record the hash of the text each chat's message shows."""
+    # Left empty: the incident-wide hash may not be what every chat shows,
+    # and an edit that turns out to be a no-op is harmless
+    conn.execute('ALTER TABLE incident_messages ADD COLUMN content_hash TEXT')
+
+
+# Applied in order; the database's user_version is the number applied so far
+MIGRATIONS = (
+    _migrate_feed_keys,
+    _migrate_sent_content,
+    _migrate_incident_updates,
+    _migrate_entry_hash,
+    _migrate_subscriptions,
+    _migrate_outbox,
+    _migrate_updates_feed_index,
+    _migrate_message_hashes,
+)
+
+
+class FeedChangeset:
+    """Result of comparing a feed snapshot with the stored incidents.
+
+    ``changed`` and ``unchanged`` hold ``(incident, stored)`` pairs.
+    """
+    def __init__(self):
+        self.new: List[Dict] = []
+        self.changed: List[tuple] = []
+        self.unchanged: List[tuple] = []
+
+    def __repr__(self):
+        return f"{len(self.new)} new, {len(self.changed)} changed, {len(self.unchanged)} unchanged"
+
+
+def categorize_incidents(incidents: List[Dict], stored: Dict[str, Dict]) -> FeedChangeset:
+    """Sort a snapshot into new, changed and unchanged incidents.
+
+    An incident counts as changed when its status or title differs from
+    the stored one. The order of ``incidents`` is kept in every list.
+    """
+    changes = FeedChangeset()
+    for incident in incidents:
+        existing = stored.get(incident['guid'])
+        if existing is None:
+            changes.new.append(incident)
+        elif existing['status'] != incident['status'] or existing['title'] != incident['title']:
+            changes.changed.append((incident, existing))
+        else:
+            changes.unchanged.append((incident, existing))
+    return changes
+
+
+def open_connection(db_path: str, wal: bool = True) -> sqlite3.Connection:
+    """Open a tuned connection that can be handed to a worker thread.
+
+    WAL keeps readers from blocking the writer in the long-running bot.
+    Short-lived runners whose database file is committed to git should
+    pass ``wal=False`` so no changes are left behind in a -wal file.
+    """
+    conn = sqlite3.connect(db_path, check_same_thread=False, cached_statements=128)
+    conn.execute(f"PRAGMA journal_mode={'WAL' if wal else 'DELETE'}")
+    for pragma in PRAGMAS:
+        conn.execute(pragma)
+    return conn
+
+
+class DatabaseManager:
+    def __init__(self, db_path: str, wal: bool = True, default_chat_id: Optional[str] = None):
+        self.db_path = db_path
+        self.conn = open_connection(db_path, wal=wal)
+        self._transaction_depth = 0
+        # All access from async code goes through this one thread, which
+        # also serializes use of the shared connection
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='sqlite')
+        self.default_chat_id = default_chat_id
+        self._init_database()
+
+    def _init_database(self):
+        with self.transaction() as conn:
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS incidents (
+                    guid TEXT PRIMARY KEY,
+                    title TEXT NOT NULL,
+                    status TEXT,
+                    description TEXT,
+                    link TEXT,
+                    posted_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    telegram_message_id INTEGER,
+                    last_updated TIMESTAMP
+                )
+            ''')
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS feed_validators (
+                    feed_url TEXT PRIMARY KEY,
+                    etag TEXT,
+                    last_modified TEXT,
+                    content_hash TEXT,
+                    updated_at TIMESTAMP
+                )
+            ''')
+        self._migrate()
+        logger.info("Database initialized")
+
+    def _migrate(self):
+        version = self.conn.execute('PRAGMA user_version').fetchone()[0]
+        for number, migration in enumerate(MIGRATIONS[version:], start=version + 1):
+            self.conn.execute('BEGIN IMMEDIATE')
+            try:
+                migration(self.conn, self.default_chat_id)
+                self.conn.execute(f'PRAGMA user_version = {number}')
+            except BaseException:
+                self.conn.rollback()
+                raise
+            self.conn.commit()
+            logger.info(f"Applied database migration {number}: {migration.__doc__}")
+
+    @contextmanager
+    def transaction(self) -> Iterator[sqlite3.Connection]:
+        """Group writes into one commit. Nested uses join the outer transaction."""
+        self._transaction_depth += 1
+        try:
+            yield self.conn
+        except BaseException:
+            if self._transaction_depth == 1:
+                self.conn.rollback()
+            raise
+        else:
+            if self._transaction_depth == 1:
+                self.conn.commit()
+        finally:
+            self._transaction_depth -= 1
+
+    async def run(self, func, *args):
+        """Run a blocking database call on the dedicated SQLite thread."""
+        # Imported here so the one-shot runner, which never awaits, skips asyncio
+        import asyncio
+
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, self._timed_call, func, args)
+
+    @staticmethod
+    def _timed_call(func, args):
+        with DB_QUERY_SECONDS.time(query=func.__name__):
+            return func(*args)
+
+    def close(self):
+        self._executor.shutdown(wait=True)
+        self.conn.close()
+
+    def get_incident(self, guid: str, feed: str = DEFAULT_FEED) -> Optional[Dict]:
+        row = self.conn.execute(SELECT_INCIDENT, (feed, guid)).fetchone()
+        if row:
+            incident = _incident_from_row(row)
+            for _, chat_id, message_id, sent_hash in self.conn.execute(SELECT_MESSAGES, (feed, guid)):
+                _add_message(incident, chat_id, message_id, sent_hash)
+            return incident
+        return None
+
+    def _load_snapshot(self, guids: List[str]):
+        # Temp tables live in memory (temp_store=MEMORY) and never hit the
+        # main database file, so loading the snapshot costs no fsync
+        self.conn.execute('CREATE TEMP TABLE IF NOT EXISTS feed_snapshot (guid TEXT PRIMARY KEY)')
+        self.conn.execute('DELETE FROM feed_snapshot')
+        self.conn.executemany(
+            'INSERT OR IGNORE INTO feed_snapshot (guid) VALUES (?)',
+            ((guid,) for guid in guids)
+        )
+
+    def _select_snapshot(self, feed: str) -> Dict[str, Dict]:
+        stored = {
+            row[1]: _incident_from_row(row)
+            for row in self.conn.execute(SELECT_SNAPSHOT_INCIDENTS, (feed,))
+        }
+        for guid, chat_id, message_id, sent_hash in self.conn.execute(SELECT_SNAPSHOT_MESSAGES, (feed,)):
+            if guid in stored:
+                _add_message(stored[guid], chat_id, message_id, sent_hash)
+        return stored
+
+    def get_incidents(self, guids: List[str], feed: str = DEFAULT_FEED) -> Dict[str, Dict]:
+        """Load the stored incidents for many GUIDs with a single join."""
+        with self.transaction():
+            self._load_snapshot(guids)
+            return self._select_snapshot(feed)
+
+    def find_incident_guid(self, path: str, guid: str, feed: str = DEFAULT_FEED) -> Optional[str]:
+        """GUID of the stored incident whose GUID or link ends in ``path``, or
+        ``guid`` if only that one is stored."""
+        pattern = '%' + path.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+        row = self.conn.execute(SELECT_INCIDENT_BY_PATH, (feed, guid, pattern, pattern, guid)).fetchone()
+        return row[0] if row else None
+
+    def rename_incidents(self, guids: Dict[str, str], feed: str = DEFAULT_FEED) -> List[str]:
+        """Move stored incidents, with their messages, history and queued
+        deliveries, from the keys to the values of ``guids``. Returns the new
+        GUIDs of the incidents that were stored."""
+        renamed = []
+        with self.transaction() as conn:
+            for old_guid, new_guid in guids.items():
+                if not conn.execute(RENAME_INCIDENT[0], (new_guid, feed, old_guid)).rowcount:
+                    continue
+                for statement in RENAME_INCIDENT[1:]:
+                    conn.execute(statement, (new_guid, feed, old_guid))
+                renamed.append(new_guid)
+        return renamed
+
+    def get_hot_incidents(self, since: datetime) -> List[Dict]:
+        """Incidents of every feed that are unresolved or were updated since
+        ``since``, with their messages and ``observed_at``, the time of the
+        last recorded transition."""
+        incidents = {}
+        for row in self.conn.execute(SELECT_HOT_INCIDENTS, (_utc_timestamp(since),)):
+            incident = _incident_from_row(row)
+            incident['observed_at'] = _parse_timestamp(row[11])
+            incidents[(incident['feed'], incident['guid'])] = incident
+        for feed, guid, chat_id, message_id, sent_hash in self.conn.execute(
+                'SELECT feed, guid, chat_id, message_id, content_hash FROM incident_messages'):
+            if (feed, guid) in incidents:
+                _add_message(incidents[(feed, guid)], chat_id, message_id, sent_hash)
+        return list(incidents.values())
+
+    def export_state(self) -> Tuple[Dict[str, Dict], List[Dict]]:
+        """Validators by feed URL and every stored incident with its messages,
+        e.g. to seed a ``StateFile``."""
+        validators = {
+            row[0]: {'etag': row[1], 'last_modified': row[2], 'content_hash': row[3]}
+            for row in self.conn.execute(
+                'SELECT feed_url, etag, last_modified, content_hash FROM feed_validators')
+        }
+        incidents = {
+            (row[0], row[1]): _incident_from_row(row)
+            for row in self.conn.execute(SELECT_ALL_INCIDENTS)
+        }
+        for feed, guid, chat_id, message_id, sent_hash in self.conn.execute(
+                'SELECT feed, guid, chat_id, message_id, content_hash FROM incident_messages'):
+            if (feed, guid) in incidents:
+                _add_message(incidents[(feed, guid)], chat_id, message_id, sent_hash)
+        return validators, list(incidents.values())
+
+    def data_version(self) -> int:
+        """Changes whenever another connection commits to the database."""
+        return self.conn.execute('PRAGMA data_version').fetchone()[0]
+
+    def get_entry_hashes(self, feed: str = DEFAULT_FEED) -> Dict[str, str]:
+        """Entry hash of every stored incident of a feed, by GUID."""
+        return dict(self.conn.execute(SELECT_ENTRY_HASHES, (feed,)))
+
+    def save_incident(self, incident: Dict):
+        self.save_incidents([incident])
+
+    def save_incidents(self, incidents: List[Dict]):
+        """Upsert incidents together with their per-chat message ids."""
+        if not incidents:
+            return
+        with self.transaction() as conn:
+            conn.executemany(UPSERT_INCIDENT, [
+                (
+                    incident.get('feed', DEFAULT_FEED),
+                    incident['guid'],
+                    incident['title'],
+                    incident.get('status', ''),
+                    incident.get('description', ''),
+                    incident.get('link', ''),
+                    incident.get('telegram_message_id'),
+                    incident.get('last_updated', datetime.now()),
+                    incident.get('content_hash'),
+                    incident.get('sent_at'),
+                    incident.get('entry_hash')
+                )
+                for incident in incidents
+            ])
+            conn.executemany(UPSERT_MESSAGE, [
+                (
+                    incident.get('feed', DEFAULT_FEED), incident['guid'], str(chat_id), message_id,
+                    (incident.get('sent_hashes') or {}).get(chat_id)
+                )
+                for incident in incidents
+                for chat_id, message_id in incident.get('messages', {}).items()
+            ])
+            self._record_updates(incidents)
+
+    def save_incident_states(self, incidents: List[Dict]):
+        """Upsert what incidents look like, leaving their delivery state alone."""
+        if not incidents:
+            return
+        with self.transaction() as conn:
+            conn.executemany(UPSERT_INCIDENT_STATE, [
+                (
+                    incident.get('feed', DEFAULT_FEED),
+                    incident['guid'],
+                    incident['title'],
+                    incident.get('status', ''),
+                    incident.get('description', ''),
+                    incident.get('link', ''),
+                    incident.get('last_updated', datetime.now()),
+                    incident.get('entry_hash')
+                )
+                for incident in incidents
+            ])
+            self._record_updates(incidents)
+
+    def _record_updates(self, incidents: List[Dict]):
+        observed_at = _utc_timestamp()
+        self.conn.executemany(INSERT_UPDATE, [
+            (
+                incident.get('feed', DEFAULT_FEED),
+                incident['guid'],
+                incident.get('status') or 'Unknown',
+                incident['title'],
+                observed_at,
+                incident.get('feed', DEFAULT_FEED),
+                incident['guid'],
+                incident.get('status') or 'Unknown'
+            )
+            for incident in incidents
+        ])
+
+    def get_incident_timeline(self, guid: str, feed: str = DEFAULT_FEED) -> List[Dict]:
+        """Status transitions of one incident, oldest first."""
+        return [
+            {'status': status, 'title': title, 'observed_at': _parse_timestamp(observed_at)}
+            for status, title, observed_at in self.conn.execute(SELECT_TIMELINE, (feed, guid))
+        ]
+
+    def get_incident_metrics(self, guid: str, feed: str = DEFAULT_FEED) -> Optional[Dict]:
+        """When an incident started, was identified and resolved, and the
+        time to identify / resolve as timedeltas (None until reached)."""
+        row = self.conn.execute(SELECT_MILESTONES, (feed, guid)).fetchone()
+        if not row or not row[3]:
+            return None
+        return _milestones(*row)
+
+    def list_incidents_between(self, start: datetime, end: datetime, feed: Optional[str] = None,
+                               status: Optional[str] = None) -> List[Dict]:
+        """Incidents with an update observed in ``[start, end)``, with metrics.
+
+        ``status`` limits the window to updates with that status, e.g. all
+        incidents resolved last week. Naive datetimes are taken as UTC.
+        """
+        where = 'observed_at >= ? AND observed_at < ?'
+        params = [_utc_timestamp(start), _utc_timestamp(end)]
+        if status:
+            where = 'status = ? AND ' + where
+            params.insert(0, status)
+        if feed:
+            where += ' AND feed = ?'
+            params.append(feed)
+
+        incidents = []
+        for row in self.conn.execute(SELECT_WINDOW_MILESTONES.format(where=where), params):
+            incident = {'feed': row[0], 'guid': row[1], 'title': row[2]}
+            incident.update(_milestones(*row[3:]))
+            incidents.append(incident)
+        return incidents
+
+    def get_subscriptions(self, feed: Optional[str] = None) -> List[Subscription]:
+        """Subscriptions of one feed, or of every feed."""
+        where, params = ('WHERE feed = ?', (feed,)) if feed else ('', ())
+        return [
+            Subscription(feed, chat_id, json.loads(components), min_severity, json.loads(statuses))
+            for feed, chat_id, components, min_severity, statuses
+            in self.conn.execute(SELECT_SUBSCRIPTIONS.format(where=where), params)
+        ]
+
+    def save_subscription(self, subscription: Subscription):
+        """Add or change a subscription. Deliveries to the chat that were given
+        up on are dropped, so its unresolved incidents are queued again."""
+        with self.transaction() as conn:
+            conn.execute('DELETE FROM outbox WHERE feed = ? AND chat_id = ? AND dead',
+                         (subscription.feed, subscription.chat_id))
+            conn.execute(UPSERT_SUBSCRIPTION, (
+                subscription.feed,
+                subscription.chat_id,
+                json.dumps(subscription.components),
+                subscription.min_severity,
+                json.dumps(subscription.statuses),
+                _utc_timestamp()
+            ))
+
+    def delete_subscription(self, feed: str, chat_id: str) -> bool:
+        with self.transaction() as conn:
+            cursor = conn.execute('DELETE FROM subscriptions WHERE feed = ? AND chat_id = ?', (feed, str(chat_id)))
+        return cursor.rowcount > 0
+
+    def enqueue_deliveries(self, deliveries: List[Dict]) -> int:
+        """Add outbox rows (see ``outbox.make_delivery``), replacing pending
+        rows of the same messages that carry an older text. Messages whose
+        delivery was given up on are skipped.
+
+        Returns how many pending rows were merged into newer ones.
+        """
+        if not deliveries:
+            return 0
+        with self.transaction() as conn:
+            conn.executemany(INSERT_DELIVERY, [
+                (
+                    delivery['idempotency_key'],
+                    delivery['feed'],
+                    delivery['guid'],
+                    delivery['chat_id'],
+                    delivery['text'],
+                    delivery['source'],
+                    delivery['not_before'],
+                    delivery['feed'],
+                    delivery['guid'],
+                    delivery['chat_id'],
+                    delivery['not_before'],
+                    delivery['created_at'],
+                    delivery['feed'],
+                    delivery['guid'],
+                    delivery['chat_id']
+                )
+                for delivery in deliveries
+            ])
+            cursor = conn.executemany(DELETE_SUPERSEDED_DELIVERIES, [
+                (delivery['feed'], delivery['guid'], delivery['chat_id'], delivery['idempotency_key'])
+                for delivery in deliveries
+            ])
+            return cursor.rowcount
+
+    def cancel_deliveries(self, feed: str, messages: List[Tuple[str, str]]):
+        """Drop pending deliveries of (GUID, chat id) messages whose posted
+        text is current again."""
+        if not messages:
+            return
+        with self.transaction() as conn:
+            conn.executemany('DELETE FROM outbox WHERE feed = ? AND guid = ? AND chat_id = ? AND dead = 0',
+                             [(feed, guid, str(chat_id)) for guid, chat_id in messages])
+
+    def get_queued_messages(self, feed: str = DEFAULT_FEED) -> Set[Tuple[str, str]]:
+        """(GUID, chat id) of every message of a feed with a pending delivery
+        or one that was given up on."""
+        return set(self.conn.execute(SELECT_QUEUED_MESSAGES, (feed,)))
+
+    def get_due_deliveries(self, now: float, limit: int = 100) -> List[Dict]:
+        """Pending deliveries due at ``now`` with the message id to edit, if any."""
+        return [
+            {
+                'id': row[0], 'feed': row[1], 'guid': row[2], 'chat_id': row[3], 'text': row[4],
+                'source': row[5], 'attempts': row[6], 'created_at': row[7], 'message_id': row[8]
+            }
+            for row in self.conn.execute(SELECT_DUE_DELIVERIES, (now, limit))
+        ]
+
+    def next_delivery_at(self) -> Optional[float]:
+        return self.conn.execute('SELECT MIN(not_before) FROM outbox WHERE dead = 0').fetchone()[0]
+
+    def record_deliveries(self, delivered: List[Dict], failed: List[Dict]) -> int:
+        """Store the outcome of a batch of deliveries in one transaction.
+
+        Delivered rows record their message id and leave the outbox; failed
+        rows are rescheduled (or marked dead) as given in ``not_before``,
+        ``attempts``, ``error`` and ``dead``. Returns the number of rows
+        still pending.
+        """
+        with self.transaction() as conn:
+            conn.executemany(UPSERT_MESSAGE, [
+                (delivery['feed'], delivery['guid'], delivery['chat_id'], delivery['message_id'],
+                 delivery['content_hash'])
+                for delivery in delivered
+            ])
+            conn.executemany(UPDATE_DELIVERED_INCIDENT, [
+                (delivery['message_id'], delivery['content_hash'], delivery['sent_at'],
+                 delivery['feed'], delivery['guid'])
+                for delivery in delivered
+            ])
+            conn.executemany('DELETE FROM outbox WHERE id = ?', [(delivery['id'],) for delivery in delivered])
+            conn.executemany(UPDATE_FAILED_DELIVERY, [
+                (delivery['attempts'], delivery['not_before'], delivery['error'], int(delivery['dead']), delivery['id'])
+                for delivery in failed
+            ])
+            return conn.execute('SELECT COUNT(*) FROM outbox WHERE dead = 0').fetchone()[0]
+
+    def get_feed_validators(self, feed_url: str) -> Optional[Dict]:
+        row = self.conn.execute(SELECT_VALIDATORS, (feed_url,)).fetchone()
+        if row:
+            return {
+                'etag': row[0],
+                'last_modified': row[1],
+                'content_hash': row[2]
+            }
+        return None
+
+    def save_feed_validators(self, feed_url: str, validators: Dict):
+        """Remember the validators of a processed response.
+
+        Nothing is written when they are unchanged, so the database file
+        stays byte-identical between runs that saw the same feed.
+        """
+        if self.get_feed_validators(feed_url) == validators:
+            return
+        with self.transaction() as conn:
+            conn.execute(UPSERT_VALIDATORS, (
+                feed_url,
+                validators.get('etag'),
+                validators.get('last_modified'),
+                validators.get('content_hash'),
+                datetime.now()
+            ))
@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""
+Per-chat subscriptions to a feed's incidents.
+
+Besides the feed's own channels, any chat can subscribe to a feed with
+optional filters on affected components, minimum severity and status.
+Subscriptions live in the ``subscriptions`` table; manage them with::
+
+    python subscriptions.py add -1001234567890 --feed default --components Editor,API --min-severity medium
+    python subscriptions.py remove -1001234567890 --feed default
+    python subscriptions.py list
+
+``SubscriptionIndex`` keeps the chats of a feed in inverted indexes by
+component, status and severity, so matching an incident costs a few set
+operations no matter how many chats subscribed.
+"""
+import argparse
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional, Set
+
+# Ordered from least to most severe
+SEVERITIES = ('low', 'medium', 'high')
+
+
+def incident_severity(incident: Dict) -> str:
+    """Severity of an incident, as shown in its message."""
+    if 'intermittent' in incident['title'].lower() or 'some' in incident['title'].lower():
+        return 'medium'
+    if incident['status'] == 'Resolved':
+        return 'low'
+    return 'high'
+
+
+class Subscription:
+    def __init__(self, feed: str, chat_id: str, components: Optional[Iterable[str]] = None,
+                 min_severity: Optional[str] = None, statuses: Optional[Iterable[str]] = None):
+        if min_severity and min_severity not in SEVERITIES:
+            raise ValueError(f"min_severity must be one of {', '.join(SEVERITIES)}")
+        self.feed = feed
+        self.chat_id = str(chat_id)
+        self.components = sorted({component.strip().lower() for component in components or [] if component.strip()})
+        self.min_severity = min_severity or None
+        self.statuses = sorted(set(statuses or []))
+
+    def key(self) -> tuple:
+        return self.feed, self.chat_id, tuple(self.components), self.min_severity, tuple(self.statuses)
+
+    def __repr__(self):
+        return f"Subscription({self.feed!r}, {self.chat_id!r})"
+
+
+class SubscriptionIndex:
+    """Chats subscribed to one feed, indexed by what they filter on."""
+
+    def __init__(self, subscriptions: Iterable[Subscription] = ()):
+        self.subscriptions = {subscription.chat_id: subscription for subscription in subscriptions}
+        self._by_component: Dict[str, Set[str]] = defaultdict(set)
+        self._any_component: Set[str] = set()
+        self._by_status: Dict[str, Set[str]] = defaultdict(set)
+        self._any_status: Set[str] = set()
+        # Chats that accept each severity, i.e. whose minimum is at or below it
+        self._by_severity: Dict[str, Set[str]] = {severity: set() for severity in SEVERITIES}
+
+        for chat, subscription in self.subscriptions.items():
+            if subscription.components:
+                for component in subscription.components:
+                    self._by_component[component].add(chat)
+            else:
+                self._any_component.add(chat)
+            if subscription.statuses:
+                for status in subscription.statuses:
+                    self._by_status[status].add(chat)
+            else:
+                self._any_status.add(chat)
+            minimum = SEVERITIES.index(subscription.min_severity or SEVERITIES[0])
+            for severity in SEVERITIES[minimum:]:
+                self._by_severity[severity].add(chat)
+
+    def __len__(self):
+        return len(self.subscriptions)
+
+    def match(self, components: Iterable[str], status: str, severity: str) -> Set[str]:
+        """Chats whose filters all accept an incident."""
+        chats = set(self._any_component)
+        for component in components:
+            chats |= self._by_component.get(component.lower(), set())
+        if chats:
+            chats &= self._any_status | self._by_status.get(status, set())
+            chats &= self._by_severity[severity]
+        return chats
+
+
+def main():
+    from config import config
+    from storage import DEFAULT_FEED, DatabaseManager
+
+    parser = argparse.ArgumentParser(description='Manage chat subscriptions to status feeds')
+    commands = parser.add_subparsers(dest='command', required=True)
+    add = commands.add_parser('add', help='subscribe a chat, replacing its filters')
+    add.add_argument('chat_id')
+    add.add_argument('--feed', default=DEFAULT_FEED)
+    add.add_argument('--components', default='', help='comma-separated component names')
+    add.add_argument('--min-severity', choices=SEVERITIES)
+    add.add_argument('--statuses', default='', help='comma-separated statuses, e.g. Investigating,Identified')
+    remove = commands.add_parser('remove', help='unsubscribe a chat')
+    remove.add_argument('chat_id')
+    remove.add_argument('--feed', default=DEFAULT_FEED)
+    listing = commands.add_parser('list', help='show subscriptions')
+    listing.add_argument('--feed')
+    args = parser.parse_args()
+
+    db = DatabaseManager(config.DATABASE_PATH, default_chat_id=config.TELEGRAM_CHANNEL_ID)
+    try:
+        if args.command == 'add':
+            db.save_subscription(Subscription(
+                args.feed,
+                args.chat_id,
+                components=args.components.split(','),
+                min_severity=args.min_severity,
+                statuses=[status.strip() for status in args.statuses.split(',') if status.strip()]
+            ))
+            print(f"Subscribed {args.chat_id} to {args.feed}")
+        elif args.command == 'remove':
+            removed = db.delete_subscription(args.feed, args.chat_id)
+            print(f"{'Unsubscribed' if removed else 'No subscription for'} {args.chat_id} from {args.feed}")
+        else:
+            subscriptions: List[Subscription] = db.get_subscriptions(args.feed)
+            for subscription in subscriptions:
+                print(
+                    f"{subscription.feed}\t{subscription.chat_id}\t"
+                    f"components={','.join(subscription.components) or '*'}\t"
+                    f"min_severity={subscription.min_severity or '*'}\t"
+                    f"statuses={','.join(subscription.statuses) or '*'}"
+                )
+    finally:
+        db.close()
+
+
+if __name__ == '__main__':
+    main()
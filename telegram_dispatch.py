@@ -0,0 +1,341 @@
+"""
+Paced delivery of Telegram messages.
+
+All sends and edits go through a priority queue drained by a bounded pool
+of workers that respect a global and a per-chat token bucket, so bursts of incident
+updates stay under Telegram's flood limits instead of failing with 429. A
+worker takes the most urgent message whose chat has a token, so a chat
+that is throttled or under a retry_after waits in the queue without
+holding up the others.
+
+python-telegram-bot is imported with the first request, so a run that has
+nothing to send never pays for loading it.
+"""
+import asyncio
+import heapq
+import itertools
+import logging
+import time
+from contextlib import asynccontextmanager
+from typing import Optional, Dict, List
+
+from caching import LRUCache, content_hash
+from metrics import TELEGRAM_ERRORS, TELEGRAM_REQUEST_SECONDS
+
+logger = logging.getLogger(__name__)
+
+# Lower values are dispatched first: a new incident is more urgent than an
+# update to a message that is already in the channel
+PRIORITY_SEND = 0
+PRIORITY_EDIT = 1
+
+# Marker returned by _deliver when the message was put back on the queue
+_RETRY = object()
+
+
+class PermanentDeliveryError(Exception):
+    """Telegram rejected a message in a way retrying cannot fix: a bad
+    request (400), e.g. a deleted message, or a chat that blocked or
+    removed the bot (403)."""
+
+
+def _error_code(error: 'TelegramError') -> str:
+    """Bot API error code for metrics, or the error class for network errors."""
+    from telegram.error import Forbidden
+
+    if isinstance(error, Forbidden):
+        return '403'
+    return type(error).__name__
+
+
+class TokenBucket:
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self) -> float:
+        """How long until a token can be taken; 0 if one is available now."""
+        now = time.monotonic()
+        self._refill(now)
+        delay = 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+        return max(delay, self.blocked_until - now)
+
+    def take(self):
+        self._refill(time.monotonic())
+        self.tokens -= 1
+
+    def block(self, seconds: float):
+        """Hold all tokens back for ``seconds``, e.g. after a retry_after."""
+        self.blocked_until = max(self.blocked_until, time.monotonic() + seconds)
+
+
+class _QueuedMessage:
+    def __init__(self, priority: int, seq: int, chat_id, text: str, message_id: Optional[int]):
+        self.priority = priority
+        self.seq = seq
+        self.chat_id = chat_id
+        self.text = text
+        self.message_id = message_id
+        self.futures: List[asyncio.Future] = []
+        self.enqueued_at = time.monotonic()
+        self.attempts = 0
+
+    def __lt__(self, other: '_QueuedMessage') -> bool:
+        return (self.priority, self.seq) < (other.priority, other.seq)
+
+
+class TelegramSendQueue:
+    def __init__(self, bot, global_rate: float = 30, chat_rate_per_minute: float = 20,
+                 max_retries: int = 5, concurrency: int = 1):
+        # A Bot, or a callable that creates it when the first request is made
+        self._bot = bot
+        self.global_bucket = TokenBucket(global_rate, global_rate)
+        self.chat_rate = chat_rate_per_minute / 60
+        self.chat_buckets: Dict[str, TokenBucket] = {}
+        self.max_retries = max_retries
+        self.concurrency = max(1, concurrency)
+
+        self._heap: List[_QueuedMessage] = []
+        self._pending_edits: Dict[tuple, _QueuedMessage] = {}
+        self._seq = itertools.count()
+        self._ready = asyncio.Event()
+        self._workers: List[asyncio.Task] = []
+        # Requests for the same message are never in flight at the same
+        # time, so a later edit cannot overtake an earlier one
+        self._message_locks: Dict[tuple, list] = {}
+
+        self.sent = 0
+        self.edited = 0
+        self.replaced = 0
+        self.retries = 0
+        self.failed = 0
+        self.skipped_edits = 0
+        # Hash of the text each message currently shows, to drop no-op edits
+        self.last_sent = LRUCache(maxsize=10000)
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+
+    def _chat_bucket(self, chat_id) -> TokenBucket:
+        key = str(chat_id)
+        if key not in self.chat_buckets:
+            # Allow a small burst so a single new incident goes out immediately
+            self.chat_buckets[key] = TokenBucket(self.chat_rate, 3)
+        return self.chat_buckets[key]
+
+    @asynccontextmanager
+    async def _message_lock(self, item: _QueuedMessage):
+        key = (str(item.chat_id), item.message_id)
+        entry = self._message_locks.setdefault(key, [asyncio.Lock(), 0])
+        entry[1] += 1
+        try:
+            async with entry[0]:
+                yield
+        finally:
+            entry[1] -= 1
+            if not entry[1]:
+                del self._message_locks[key]
+
+    def _ensure_workers(self):
+        self._workers = [worker for worker in self._workers if not worker.done()]
+        while len(self._workers) < self.concurrency:
+            self._workers.append(asyncio.create_task(self._run()))
+
+    async def close(self):
+        """Stop the workers. Messages still queued are not sent."""
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+
+    async def send(self, chat_id, text: str, message_id: Optional[int] = None) -> Optional[int]:
+        """Queue a new message (or an edit of ``message_id``) and wait for it.
+
+        Returns the Telegram message id, or None if delivery failed; raises
+        ``PermanentDeliveryError`` if Telegram rejected it for good. A newer
+        edit of a message that is still queued replaces the queued text.
+        """
+        key = (str(chat_id), message_id)
+        pending = self._pending_edits.get(key) if message_id else None
+        if message_id and not pending and self.last_sent.get(key) == content_hash(text):
+            self.skipped_edits += 1
+            logger.info(f"Message {message_id} already shows this text, skipping edit")
+            return message_id
+
+        future = asyncio.get_running_loop().create_future()
+        if pending:
+            pending.text = text
+            pending.futures.append(future)
+            self.replaced += 1
+        else:
+            priority = PRIORITY_EDIT if message_id else PRIORITY_SEND
+            item = _QueuedMessage(priority, next(self._seq), chat_id, text, message_id)
+            item.futures.append(future)
+            if message_id:
+                self._pending_edits[key] = item
+            heapq.heappush(self._heap, item)
+            self._ready.set()
+
+        self._ensure_workers()
+        return await future
+
+    def _next_ready(self):
+        """Pop the most urgent message whose chat may be sent to now.
+
+        Returns ``(message, None)``, or ``(None, seconds)`` until the first
+        queued message becomes ready (None when the queue is empty).
+        """
+        if not self._heap:
+            return None, None
+        wait = self.global_bucket.wait_time()
+        if wait > 0:
+            return None, wait
+        chat_waits = {}
+        for item in sorted(self._heap):
+            chat = str(item.chat_id)
+            if chat not in chat_waits:
+                chat_waits[chat] = self._chat_bucket(chat).wait_time()
+                if chat_waits[chat] <= 0:
+                    self._heap.remove(item)
+                    heapq.heapify(self._heap)
+                    return item, None
+        return None, min(chat_waits.values())
+
+    async def _run(self):
+        while True:
+            # Messages to throttled chats stay queued, so they hold up
+            # neither a worker nor the other chats
+            item, wait = self._next_ready()
+            if item is None:
+                self._ready.clear()
+                try:
+                    await asyncio.wait_for(self._ready.wait(), wait)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            self.global_bucket.take()
+            self._chat_bucket(item.chat_id).take()
+
+            # Edits stay replaceable until the request is actually made
+            if item.message_id:
+                self._pending_edits.pop((str(item.chat_id), item.message_id), None)
+
+            if item.attempts == 0:
+                waited = time.monotonic() - item.enqueued_at
+                self.wait_total += waited
+                self.wait_max = max(self.wait_max, waited)
+
+            try:
+                if item.message_id:
+                    async with self._message_lock(item):
+                        result = await self._deliver(item)
+                else:
+                    result = await self._deliver(item)
+            except Exception as e:
+                for future in item.futures:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            if result is not _RETRY:
+                for future in item.futures:
+                    if not future.done():
+                        future.set_result(result)
+
+    @property
+    def bot(self):
+        if callable(self._bot):
+            self._bot = self._bot()
+        return self._bot
+
+    @bot.setter
+    def bot(self, bot):
+        self._bot = bot
+
+    async def _deliver(self, item: _QueuedMessage):
+        from telegram.constants import ParseMode
+        from telegram.error import TelegramError, RetryAfter, BadRequest, Forbidden
+
+        item.attempts += 1
+        method = 'editMessageText' if item.message_id else 'sendMessage'
+        started = time.perf_counter()
+        try:
+            if item.message_id:
+                await self.bot.edit_message_text(
+                    chat_id=item.chat_id,
+                    message_id=item.message_id,
+                    text=item.text,
+                    parse_mode=ParseMode.MARKDOWN,
+                    disable_web_page_preview=True
+                )
+                self.edited += 1
+                self.last_sent.put((str(item.chat_id), item.message_id), content_hash(item.text))
+                logger.info(f"Updated message {item.message_id}")
+                return item.message_id
+            else:
+                result = await self.bot.send_message(
+                    chat_id=item.chat_id,
+                    text=item.text,
+                    parse_mode=ParseMode.MARKDOWN,
+                    disable_web_page_preview=True
+                )
+                self.sent += 1
+                self.last_sent.put((str(item.chat_id), result.message_id), content_hash(item.text))
+                logger.info(f"Sent new message {result.message_id}")
+                return result.message_id
+        except RetryAfter as e:
+            TELEGRAM_ERRORS.inc(method=method, code='429')
+            if item.attempts > self.max_retries:
+                logger.error(f"Giving up after {item.attempts} attempts: {e}")
+                self.failed += 1
+                return None
+            logger.warning(f"Flood control for chat {item.chat_id}, retrying in {e.retry_after}s")
+            self._chat_bucket(item.chat_id).block(e.retry_after)
+            self.retries += 1
+            if item.message_id:
+                self._pending_edits[(str(item.chat_id), item.message_id)] = item
+            heapq.heappush(self._heap, item)
+            self._ready.set()
+            return _RETRY
+        except BadRequest as e:
+            TELEGRAM_ERRORS.inc(method=method, code='400')
+            if item.message_id and 'message is not modified' in str(e).lower():
+                # Telegram already shows this text, the edit is a success
+                self.skipped_edits += 1
+                self.last_sent.put((str(item.chat_id), item.message_id), content_hash(item.text))
+                return item.message_id
+            logger.error(f"Failed to send/update Telegram message: {e}")
+            self.failed += 1
+            raise PermanentDeliveryError(str(e)) from e
+        except Forbidden as e:
+            TELEGRAM_ERRORS.inc(method=method, code='403')
+            logger.error(f"Failed to send/update Telegram message: {e}")
+            self.failed += 1
+            raise PermanentDeliveryError(str(e)) from e
+        except TelegramError as e:
+            TELEGRAM_ERRORS.inc(method=method, code=_error_code(e))
+            logger.error(f"Failed to send/update Telegram message: {e}")
+            self.failed += 1
+            return None
+        finally:
+            TELEGRAM_REQUEST_SECONDS.observe(time.perf_counter() - started, method=method)
+
+    def stats(self) -> Dict:
+        dispatched = self.sent + self.edited + self.failed
+        return {
+            'queue_depth': len(self._heap),
+            'sent': self.sent,
+            'edited': self.edited,
+            'replaced': self.replaced,
+            'retries': self.retries,
+            'failed': self.failed,
+            'skipped_edits': self.skipped_edits,
+            'wait_avg': self.wait_total / dispatched if dispatched else 0.0,
+            'wait_max': self.wait_max
+        }
+
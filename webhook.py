@@ -0,0 +1,217 @@
+"""
+Push ingestion of Statuspage webhooks.
+
+Statuspage can POST every incident update to a URL. ``start_webhook_server``
+accepts those payloads on ``/webhook/<feed name>``, ``normalize_statuspage``
+turns them into the same incident dicts the RSS reader produces, and the
+bot hands them straight to the feed's monitor. RSS polling keeps running
+as a slower reconciliation pass for pushes that never arrived.
+
+Payloads carry Statuspage's incident id, not the feed entry's GUID. A push
+is matched to a stored incident whose GUID or link ends in
+``/incidents/<id>``; an incident that is not stored yet is kept under
+``webhook:<id>`` until its feed entry turns up, and is then re-keyed to
+the entry's GUID (see ``FeedMonitor.process``).
+"""
+import asyncio
+import hmac
+import html
+import json
+import logging
+import time
+from datetime import datetime, timezone
+from email.utils import format_datetime
+from typing import Awaitable, Callable, Dict, List, Optional
+from urllib.parse import parse_qs, urlsplit
+
+from feed_parser import Incident, entry_hash, parse_timestamp
+
+logger = logging.getLogger(__name__)
+
+MAX_BODY_BYTES = 1024 * 1024
+
+STATUSPAGE_STATUSES = {
+    'investigating': 'Investigating',
+    'identified': 'Identified',
+    'monitoring': 'Monitoring',
+    'resolved': 'Resolved',
+    'postmortem': 'Resolved',
+    'completed': 'Resolved',
+}
+
+# Called with (feed name, payload, receive time as a Unix timestamp); returns False
+# for an unknown feed and raises PayloadError for a malformed payload
+PushHandler = Callable[[str, Dict, float], Awaitable[bool]]
+
+# Key of a pushed incident whose feed entry has not been seen yet
+PENDING_PREFIX = 'webhook:'
+
+
+def pending_guid(incident_id: str) -> str:
+    return PENDING_PREFIX + incident_id
+
+
+def statuspage_id(url: str) -> Optional[str]:
+    """Statuspage incident id at the end of a GUID or link, if any."""
+    _, found, rest = (url or '').rpartition('/incidents/')
+    return rest.strip('/') or None if found else None
+
+
+class PayloadError(ValueError):
+    """A webhook payload that is not shaped like a Statuspage one."""
+
+
+def _string(value, name: str, default: str = '') -> str:
+    if value is None:
+        return default
+    if not isinstance(value, str):
+        raise PayloadError(f"{name} must be a string")
+    return value
+
+
+def _objects(value, name: str) -> List[Dict]:
+    if value is None:
+        return []
+    if not isinstance(value, list) or not all(isinstance(item, dict) for item in value):
+        raise PayloadError(f"{name} must be a list of objects")
+    return value
+
+
+def normalize_statuspage(payload, feed: str, page_url: str) -> Optional[Incident]:
+    """Incident for a Statuspage incident webhook, None for other events.
+
+    Raises ``PayloadError`` for a payload whose fields have the wrong types.
+    """
+    if not isinstance(payload, dict):
+        raise PayloadError("payload must be an object")
+    incident = payload.get('incident')
+    if incident is None:
+        return None
+    if not isinstance(incident, dict):
+        raise PayloadError("incident must be an object")
+    incident_id = _string(incident.get('id'), 'incident.id')
+    if not incident_id:
+        raise PayloadError("incident.id is missing")
+
+    status = STATUSPAGE_STATUSES.get(_string(incident.get('status'), 'incident.status'), 'Unknown')
+    updates = _objects(incident.get('incident_updates'), 'incident.incident_updates')
+    latest = max(updates, key=lambda update: _string(update.get('created_at'), 'created_at'), default={})
+    body = _string(latest.get('body'), 'incident_updates.body')
+
+    # Same shape as the feed's descriptions, so cleaning and rendering match
+    description = f"<b>Status: {status}</b><br /><br />{html.escape(body)}"
+    components = _objects(incident.get('components'), 'incident.components')
+    if components:
+        description += '<br /><br /><b>Affected components</b><ul>' + ''.join(
+            f"<li>{html.escape(_string(component.get('name'), 'components.name'))} "
+            f"({_string(component.get('status'), 'components.status').replace('_', ' ').capitalize()})</li>"
+            for component in components
+        ) + '</ul>'
+
+    # Statuspage sends ISO 8601 times; last_updated takes the RSS pubDate
+    # format the feed's incidents are stored with. The entry hash still
+    # differs from the feed entry's, as the description is built here.
+    published = parse_timestamp(
+        _string(incident.get('updated_at'), 'incident.updated_at') or latest.get('created_at')
+    ) or datetime.now(timezone.utc)
+    normalized = {
+        'feed': feed,
+        # Resolved to the stored incident's GUID before the diff
+        'guid': pending_guid(incident_id),
+        'title': _string(incident.get('name'), 'incident.name', 'No title'),
+        'description': description,
+        'link': f"{page_url.rstrip('/')}/incidents/{incident_id}",
+        'last_updated': format_datetime(published, usegmt=True),
+        'published': published,
+        'status': status
+    }
+    normalized['entry_hash'] = entry_hash(normalized)
+    return normalized
+
+
+def page_url(feed_url: str) -> str:
+    """Statuspage root of a feed URL, e.g. https://status.example.com."""
+    parts = urlsplit(feed_url)
+    return f"{parts.scheme}://{parts.netloc}"
+
+
+async def _respond(writer: asyncio.StreamWriter, status: str, payload: Dict):
+    body = json.dumps(payload).encode('utf-8')
+    writer.write(
+        f'HTTP/1.1 {status}\r\n'
+        f'Content-Type: application/json\r\n'
+        f'Content-Length: {len(body)}\r\n'
+        f'Connection: close\r\n\r\n'.encode('latin-1') + body
+    )
+    await writer.drain()
+
+
+async def _handle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter,
+                  on_push: PushHandler, secret: Optional[str]):
+    try:
+        request_line = (await reader.readline()).decode('latin-1').split()
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b'\r\n', b'\n', b''):
+                break
+            name, _, value = line.decode('latin-1').partition(':')
+            headers[name.strip().lower()] = value.strip()
+        received_at = time.time()
+
+        if len(request_line) < 2 or request_line[0] != 'POST':
+            await _respond(writer, '405 Method Not Allowed', {'error': 'POST only'})
+            return
+        url = urlsplit(request_line[1])
+        if not url.path.startswith('/webhook/'):
+            await _respond(writer, '404 Not Found', {'error': 'unknown path'})
+            return
+        if secret:
+            token = headers.get('x-webhook-token') or parse_qs(url.query).get('token', [''])[0]
+            if not hmac.compare_digest(token, secret):
+                await _respond(writer, '403 Forbidden', {'error': 'bad token'})
+                return
+
+        try:
+            length = int(headers['content-length'])
+            if length < 0:
+                raise ValueError(length)
+        except (KeyError, ValueError):
+            await _respond(writer, '400 Bad Request', {'error': 'missing or invalid Content-Length'})
+            return
+        if length > MAX_BODY_BYTES:
+            await _respond(writer, '413 Payload Too Large', {'error': 'body too large'})
+            return
+        try:
+            payload = json.loads(await reader.readexactly(length))
+        except (ValueError, asyncio.IncompleteReadError):
+            await _respond(writer, '400 Bad Request', {'error': 'invalid JSON'})
+            return
+
+        try:
+            accepted = await on_push(url.path[len('/webhook/'):], payload, received_at)
+        except PayloadError as e:
+            await _respond(writer, '400 Bad Request', {'error': str(e)})
+            return
+        if accepted:
+            await _respond(writer, '202 Accepted', {'ok': True})
+        else:
+            await _respond(writer, '404 Not Found', {'error': 'unknown feed'})
+    except ConnectionError:
+        pass
+    except Exception as e:
+        logger.error(f"Error handling webhook request: {e}", exc_info=True)
+        try:
+            # Statuspage retries a failed delivery; tell it this one failed
+            await _respond(writer, '500 Internal Server Error', {'error': 'internal error'})
+        except Exception:
+            pass
+    finally:
+        writer.close()
+
+
+async def start_webhook_server(host: str, port: int, on_push: PushHandler,
+                               secret: Optional[str] = None) -> asyncio.AbstractServer:
+    server = await asyncio.start_server(lambda r, w: _handle(r, w, on_push, secret), host, port)
+    logger.info(f"Accepting Statuspage webhooks on http://{host}:{port}/webhook/<feed>")
+    return server